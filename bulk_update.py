@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""Export large sets of patron changes as a CSV for Koha's Import Patrons tool
+and spot-check the patrons afterwards. patron_update.py writes the export when
+more patrons need updates than --bulk-threshold, because thousands of
+individual PUTs are much slower than one staff-side import. Run this script on
+the export once it has been imported to verify a random sample of patrons."""
+
+from __future__ import annotations
+
+import csv
+import random
+import sys
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import click
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+# Koha patron import column => patron API field. The import keeps the existing
+# values of columns that aren't in the file, so only fields patron_update.py
+# changes are exported, plus the ones the import requires.
+COLUMNS: dict[str, str] = {
+    "userid": "userid",
+    "cardnumber": "cardnumber",
+    "firstname": "firstname",
+    "surname": "surname",
+    "preferred_name": "preferred_name",
+    "sort2": "statistics_2",
+    "branchcode": "library_id",
+    "categorycode": "category_id",
+}
+# columns compared by the verification pass
+VERIFIED: tuple[str, ...] = ("cardnumber", "firstname", "surname", "preferred_name")
+
+
+def export_row(koha: dict[str, Any]) -> dict[str, str]:
+    return {column: koha.get(field) or "" for column, field in COLUMNS.items()}
+
+
+def write_export(records: list[dict[str, Any]], path: str | Path | None = None) -> str:
+    """Write updated Koha patron records to an import CSV, returns its name"""
+    from compressed import open_text
+
+    filename: str = str(path or f"{date.today().isoformat()}-patron-bulk-update.csv")
+    with open_text(filename, "w") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(export_row(koha) for koha in records)
+    return filename
+
+
+def read_export(path: str | Path) -> list[dict[str, str]]:
+    from compressed import open_text
+
+    with open_text(path) as file:
+        return list(csv.DictReader(file))
+
+
+def mismatches(row: dict[str, str], koha: dict[str, Any]) -> list[str]:
+    return [
+        f"{column} {koha.get(COLUMNS[column])!r} != {row[column]!r}"
+        for column in VERIFIED
+        if (koha.get(COLUMNS[column]) or "") != row[column]
+    ]
+
+
+def verify(http: Session, row: dict[str, str]) -> list[str]:
+    """Problems with one exported patron in Koha, empty if it was imported"""
+    from koha_patron.config import config
+
+    response: Response = http.get(
+        f"{config['api_root']}/patrons?userid={row['userid']}&_match=exact"
+    )
+    if not response.ok:
+        return [f"HTTP {response.status_code}"]
+    patrons: list[dict[str, Any]] = response.json()
+    if len(patrons) != 1:
+        return [f"{len(patrons)} patrons with this userid"]
+    return mismatches(row, patrons[0])
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.argument(
+    "export",
+    type=click.Path(dir_okay=False, exists=True, readable=True),
+)
+@click.option(
+    "-n",
+    "--sample",
+    default=25,
+    show_default=True,
+    help="Number of exported patrons to check, 0 checks all of them",
+    type=click.IntRange(min=0),
+)
+def main(export: Path, sample: int):
+    """Spot-check that the patrons in an imported EXPORT CSV match it in Koha"""
+    from termcolor import colored
+
+    from patron_update import confirm_network, koha_session
+
+    confirm_network()
+
+    http: Session = koha_session()
+
+    rows: list[dict[str, str]] = read_export(export)
+    if sample and sample < len(rows):
+        rows = random.sample(rows, sample)
+    failed: int = 0
+    for row in rows:
+        problems: list[str] = verify(http, row)
+        if problems:
+            failed += 1
+            print(colored(f"{row['userid']}: {'; '.join(problems)}", "red"))
+
+    print(f"\nChecked {len(rows)} patrons from {export}, {failed} did not match.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 """Deletes files involved in the patron load process."""
 
 import os
+import shutil
 from datetime import date
+from glob import glob
 
 today: str = date.today().isoformat()
 
@@ -9,12 +11,48 @@ for file in [
     f"{today}-missing-employees.json",
     "employee_data.json",
     f"{today}-missing-students.json",
+    f"{today}-orphans.json",
+    f"{today}-patron-bulk-update.csv",
     "student_data.json",
     "patron_bulk_import.csv",
     "data/prox.csv",
+] + [
+    # compressed copies of the data files
+    f"{name}{ext}"
+    for name in (
+        "employee_data.json",
+        "student_data.json",
+        "patron_bulk_import.csv",
+        "data/prox.csv",
+    )
+    for ext in (".gz", ".zst")
 ]:
     try:
         os.remove(file)
         print(f"Deleted {file}")
     except FileNotFoundError:
         print(f"Couldn't find {file} to delete")
+
+# patron_update.py --target output, named after each target
+for file in glob(f"{today}-*-missing-*.json") + glob(
+    f"{today}-*-patron-bulk-update.csv"
+):
+    os.remove(file)
+    print(f"Deleted {file}")
+
+# patron_bulk_import.manifest.json is kept, it only holds keyed fingerprints of
+# imported rows & the next semester's CSV needs it to leave them out
+
+# lookup.py's index of the data files
+try:
+    os.remove(".lookup_index.sqlite")
+    print("Deleted .lookup_index.sqlite")
+except FileNotFoundError:
+    print("Couldn't find .lookup_index.sqlite to delete")
+
+# validated Workday records cached by workday/cache.py
+try:
+    shutil.rmtree(".workday_cache")
+    print("Deleted .workday_cache")
+except FileNotFoundError:
+    print("Couldn't find .workday_cache to delete")
@@ -0,0 +1,59 @@
+"""Open data files that may be gzip or zstandard compressed. Compressed input
+is detected by magic bytes rather than file extension, so renamed files still
+work; output is compressed when its name ends in .gz or .zst."""
+
+import gzip
+from pathlib import Path
+from typing import IO
+
+GZIP_MAGIC: bytes = b"\x1f\x8b"
+ZSTD_MAGIC: bytes = b"\x28\xb5\x2f\xfd"
+
+
+def zstd_module():
+    # stdlib in Python 3.14+, otherwise the optional zstandard package
+    try:
+        from compression import zstd  # type: ignore
+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        raise RuntimeError(
+            "Zstandard compressed files need Python 3.14+ or the zstandard "
+            "package (uv add zstandard)."
+        )
+
+
+def detect(path: str | Path) -> str | None:
+    """Return "gzip", "zstd", or None for uncompressed files"""
+    with open(path, "rb") as file:
+        magic: bytes = file.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def open_text(path: str | Path, mode: str = "r") -> IO[str]:
+    """Like open() in text mode but (de)compresses gzip and zstd streams.
+    Reads are detected by magic bytes, writes & appends by file extension."""
+    if "r" in mode:
+        kind: str | None = detect(path)
+    elif str(path).endswith(".gz"):
+        kind = "gzip"
+    elif str(path).endswith(".zst"):
+        kind = "zstd"
+    else:
+        kind = None
+
+    if kind == "gzip":
+        return gzip.open(path, mode.replace("+", "") + "t")  # type: ignore
+    if kind == "zstd":
+        return zstd_module().open(path, mode.replace("+", "") + "t")
+    return open(path, mode)
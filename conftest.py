@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+import fingerprint
+
+
+def pytest_collection_modifyitems(config, items):
+    # wall-clock & memory measurements are flaky on a loaded machine
+    if os.environ.get("PERF_TESTS") == "1":
+        return
+    skip = pytest.mark.skip(reason="set PERF_TESTS=1 to run")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def fingerprint_key(monkeypatch):
+    # never create .fingerprint_key in the working tree during tests
+    monkeypatch.setattr(fingerprint, "key", lambda: b"test key")
+
+
+def make_employee(i: int, **fields) -> dict:
+    return {
+        "active_status": True,
+        "employee_id": f"e{i}",
+        "etype": "Staff",
+        "first_name": "Staff",
+        "is_contingent": False,
+        "last_name": f"Member {i}",
+        "universal_id": str(2000000 + i),
+        "username": f"staff{i}",
+        "work_email": f"staff{i}@cca.edu",
+        **fields,
+    }
+
+
+@pytest.fixture
+def employee():
+    """Workday employee JSON for staff member i, keyword arguments override
+    fields: employee(1, last_name="Renamed 1")"""
+    return make_employee
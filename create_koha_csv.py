@@ -1,47 +1,231 @@
 #!/usr/bin/env python
+# validation and colour libraries are imported inside the functions that use
+# them so `--help` stays fast
+from __future__ import annotations
+
 import csv
 import json
 import os
+from collections import defaultdict
+from collections.abc import Iterable
 from datetime import date, timedelta
-from typing import Any
+from functools import cache
+from itertools import compress
+from typing import TYPE_CHECKING, Any
 
 import click
-from termcolor import colored
 
+from compressed import open_text
 from koha_mappings import category, fac_depts, stu_major
-from patron_update import create_prox_map
-from workday.models import Employee, Person, Student
-from workday.utils import get_entries
+from prox import create_prox_map
+
+if TYPE_CHECKING:
+    from workday.models import Employee, Person, Student
 
 today: date = date.today()
 
 
 def warn(string) -> None:
+    from termcolor import colored
+
     print(colored("Warning: " + string, "red"))
 
 
+class WarningReport:
+    """Collects per-record warnings grouped by kind & offending value so they
+    can be reported once at the end instead of printed for every record."""
+
+    def __init__(self, verbose: bool = False, samples: int = 5):
+        # also print each warning as it happens, the old behavior
+        self.verbose: bool = verbose
+        self.samples: int = samples
+        self.groups: defaultdict[str, defaultdict[str, list[str]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+
+    def add(self, kind: str, value: Any, username: str, message: str) -> None:
+        if self.verbose:
+            warn(message)
+        self.groups[kind][str(value)].append(username)
+
+    def __len__(self) -> int:
+        return sum(len(u) for values in self.groups.values() for u in values.values())
+
+    def render(self) -> str:
+        lines: list[str] = [f"=== Warnings ({len(self)}) ==="]
+        for kind, values in sorted(self.groups.items()):
+            lines.append(f"{kind}: {sum(len(u) for u in values.values())}")
+            # most common offending values first
+            for value, usernames in sorted(values.items(), key=lambda v: -len(v[1])):
+                sample: str = ", ".join(usernames[: self.samples])
+                more: str = ", ..." if len(usernames) > self.samples else ""
+                lines.append(f"  {value} ({len(usernames)}): {sample}{more}")
+        return "\n".join(lines)
+
+    def write(self, file: str | None = None) -> None:
+        if not self.groups:
+            return
+        if file:
+            with open(file, "w") as fh:
+                fh.write(self.render() + "\n")
+            print(f"Wrote {len(self)} warnings to {file}")
+        else:
+            print(self.render())
+
+
+# global var that the row functions add to
+report = WarningReport()
+
+
+class Manifest:
+    """Fingerprints of the rows Koha has imported, by fingerprint of userid,
+    so we only emit patrons who are new or whose row changed. Rows of the CSV
+    being generated are kept as pending & only count as imported once
+    commit() runs after a successful import, so re-running after a failed
+    import or a mapping fix still writes them. Enrollment & expiration dates
+    are left out because they change every run/semester and the import
+    ignores existing patrons anyway. Fingerprints are keyed (see
+    fingerprint.py) so the file can outlive clean.py's data cleanup."""
+
+    IGNORED_FIELDS: tuple[str, ...] = ("dateenrolled", "dateexpiry")
+
+    def __init__(self, path: str, full: bool = False):
+        self.path: str = path
+        # --full emits every row but still records their fingerprints
+        self.full: bool = full
+        self.imported: dict[str, str] = {}
+        self.pending: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                saved: dict[str, dict[str, str]] = json.load(file)
+            self.imported = saved.get("imported", {})
+        self.emitted: int = 0
+        self.skipped: int = 0
+
+    def row_hash(self, row: dict) -> str:
+        from fingerprint import fingerprint
+
+        values: dict = {k: v for k, v in row.items() if k not in self.IGNORED_FIELDS}
+        return fingerprint(json.dumps(values, sort_keys=True))
+
+    def changed(self, row: dict) -> bool:
+        from fingerprint import fingerprint
+
+        userid: str = fingerprint(row["userid"])
+        digest: str = self.row_hash(row)
+        if not self.full and self.imported.get(userid) == digest:
+            self.skipped += 1
+            return False
+        self.pending[userid] = digest
+        self.emitted += 1
+        return True
+
+    def write(self) -> None:
+        partial: str = f"{self.path}.partial"
+        with open(partial, "w") as file:
+            json.dump({"imported": self.imported, "pending": self.pending}, file)
+        os.replace(partial, self.path)
+
+    def save(self) -> None:
+        """Record the CSV just generated as pending, replacing the last one"""
+        self.write()
+        print(
+            f"Wrote {self.emitted} new or changed rows, skipped {self.skipped} "
+            f"already imported (see {self.path}). After Koha imports the CSV, run "
+            f"with --commit-manifest so the next CSV leaves these rows out."
+        )
+
+    def commit(self, rejected: Iterable[str] = ()) -> None:
+        """Mark the pending rows, i.e. the last CSV, as imported except for the
+        userids Koha rejected, which stay pending so the next CSV has them"""
+        from fingerprint import fingerprint
+
+        with open(self.path) as file:
+            pending: dict[str, str] = json.load(file).get("pending", {})
+        skip: set[str] = {fingerprint(userid) for userid in rejected}
+        self.pending = {k: v for k, v in pending.items() if k in skip}
+        self.imported.update({k: v for k, v in pending.items() if k not in skip})
+        print(
+            f"Marked {len(pending) - len(self.pending)} rows as imported in "
+            f"{self.path}, {len(self.pending)} rejected rows stay pending"
+        )
+        self.write()
+
+
+# global var set in main, filters rows proc_students/proc_staff write
+manifest: Manifest | None = None
+# global var set in main, library new patrons belong to
+branchcode: str = "SF"
+
+
+def emit(row: dict | None) -> bool:
+    if not row:
+        return False
+    return manifest is None or manifest.changed(row)
+
+
+EXCEPTIONS: list[str] = ["deborahstein", "sraffeld"]
+# etype=Instructors job profiles that are expected special programs faculty
+INSTRUCTOR_PROFILES: tuple[str, ...] = (
+    "Atelier Instructor",
+    "Special Programs Instructor",
+    "YASP & Atelier Youth Programs Instructor",
+)
+
+
 def is_exception(user: Person) -> bool:
-    exceptions: list[str] = ["deborahstein", "sraffeld"]
-    if user.username in exceptions:
+    if user.username in EXCEPTIONS:
         return True
     return False
 
 
+def student_included(student: Student) -> bool:
+    """Whether student gets a Koha account, see make_student_row"""
+    if is_exception(student):
+        return False
+    # some students don't have CCA emails, skip them
+    # one student record in Summer 2021 lacked a last_name
+    return student.inst_email is not None and student.last_name is not None
+
+
+def employee_included(person: Employee) -> bool:
+    """Whether person gets a Koha account, see make_employee_row"""
+    if is_exception(person):
+        return False
+    # skip inactive, people w/o emails, & the one random record for a student
+    if (
+        not person.active_status
+        or not person.work_email
+        or person.etype in ("Contingent Employees/Contractors", "Students")
+    ):
+        return False
+    # skip inactive special programs faculty
+    if person.job_profile == "Special Programs Instructor (inactive)":
+        return False
+    # skip contingent employees
+    return person.is_contingent != "1"
+
+
 def make_student_row(
-    student_dict: dict[str, Any], prox_map: dict[str, str], end_date: str
+    student_dict: dict[str, Any] | Student,
+    prox_map: dict[str, str],
+    end_date: str,
+    warnings: WarningReport | None = None,
 ) -> dict | None:
-    student: Student = Student(**student_dict)
+    """Bulk import row for a student or None if they're skipped. Warnings go
+    to warnings, the script's report by default."""
+    from workday.models import Student
 
-    if is_exception(student):
-        return None
+    warnings = report if warnings is None else warnings
+    student: Student = (
+        student_dict if isinstance(student_dict, Student) else Student(**student_dict)
+    )
 
-    # some students don't have CCA emails, skip them
-    # one student record in Summer 2021 lacked a last_name
-    if student.inst_email is None or student.last_name is None:
+    if not student_included(student):
         return None
 
     patron: dict[str, str] = {
-        "branchcode": "SF",
+        "branchcode": branchcode,
         "categorycode": category[student.academic_level],
         # fill in Prox number if we have it, or default to UID
         "cardnumber": prox_map.get(student.universal_id, student.universal_id).strip(),
@@ -70,16 +254,21 @@ def make_student_row(
                 break
     # we couldn't find a major, print a warning
     if major is None:
-        warn(
+        warnings.add(
+            "Unmapped student major",
+            student.primary_program,
+            student.username,
             f"""Unable to parse major for student {student.username}
 Primary program: {student.primary_program}
-Program credentials: {student.programs}"""
+Program credentials: {student.programs}""",
         )
 
     return patron
 
 
-def expiration_date(person: Employee, end_date: str) -> str:
+def expiration_date(
+    person: Employee, end_date: str, warnings: WarningReport | None = None
+) -> str:
     """Calculate patron expiration date based on personnel data and the last
     day of the semester.
 
@@ -89,6 +278,8 @@ def expiration_date(person: Employee, end_date: str) -> str:
         Dict of user data. "etype" and "future_etype" are most important here.
     end_date : str
         Last day of the semester in YYYY-MM-DD format.
+    warnings : WarningReport, optional
+        Where to add warnings, the script's report by default.
 
     Returns
     -------
@@ -98,17 +289,41 @@ def expiration_date(person: Employee, end_date: str) -> str:
         during Spring, this is May 31 of the current year. For staff, it is the
         last day of the last month of the impending semester.
     """
+    warnings = report if warnings is None else warnings
     # there are 3 etypes: Staff, Instructors, Faculty. Sometimes we do not have
     # an etype but _do_ have a "future_etype".
     etype: str | None = person.etype or person.etype_future
     if not etype:
-        warn(
+        warnings.add(
+            "Employee without etype (given Staff expiration)",
+            person.job_profile,
+            person.username,
             (
                 "Employee {} does not have an etype nor a etype_future. They "
                 "will be assigned the Staff expiration date.".format(person.username)
-            )
+            ),
         )
         etype = "Staff"
+    elif etype not in ("Instructors", "Staff") and not typical_semester(end_date):
+        # implies faculty
+        warnings.add(
+            "End date not in a typical semester (faculty given Staff expiration)",
+            end_date,
+            person.username,
+            f"""End date {end_date} is not in May, August, or December so it does not map to a typical semester. Faculty accounts will be given the Staff expiration date of one year.""",
+        )
+    return semester_expiry(etype, end_date)
+
+
+def typical_semester(end_date: str) -> bool:
+    # Spring, Summer, & Fall semesters end in May, August, & December
+    return date.fromisoformat(end_date).month in (5, 8, 12)
+
+
+@cache
+def semester_expiry(etype: str, end_date: str) -> str:
+    """Expiration date for an etype given the last day of the semester, see
+    expiration_date. Cached because there are only a few etypes."""
     d: date = date.fromisoformat(end_date)
     if etype == "Instructors":
         # go into next month then subtract the number of days from next month
@@ -129,26 +344,25 @@ def expiration_date(person: Employee, end_date: str) -> str:
         elif d.month == 12:
             return str(d.replace(year=d.year + 1, month=1, day=31))
         else:
-            warn(
-                f"""End date {end_date} is not in May, August, or December so it does not map to a typical semester. Faculty accounts will be given the Staff expiration date of one year."""
-            )
             return str(today.replace(year=today.year + 1))
 
 
 def make_employee_row(
-    person_dict: dict[str, Any], prox_map: dict[str, str], end_date: str
+    person_dict: dict[str, Any] | Employee,
+    prox_map: dict[str, str],
+    end_date: str,
+    warnings: WarningReport | None = None,
 ) -> dict | None:
-    person: Employee = Employee(**person_dict)
+    """Bulk import row for an employee or None if they're skipped. Warnings
+    go to warnings, the script's report by default."""
+    from workday.models import Employee
 
-    if is_exception(person):
-        return None
+    warnings = report if warnings is None else warnings
+    person: Employee = (
+        person_dict if isinstance(person_dict, Employee) else Employee(**person_dict)
+    )
 
-    # skip inactive, people w/o emails, & the one random record for a student
-    if (
-        not person.active_status
-        or not person.work_email
-        or person.etype in ("Contingent Employees/Contractors", "Students")
-    ):
+    if not employee_included(person):
         return None
 
     # create a hybrid program/department field
@@ -161,37 +375,29 @@ def make_employee_row(
     elif person.job_profile in fac_depts:
         prodep = person.job_profile
 
-    # skip inactive special programs faculty
-    if person.job_profile == "Special Programs Instructor (inactive)":
-        return None
-    # skip contingent employees
-    if person.is_contingent == "1":
-        return None
     # we assume etype=Instructors => special programs faculty
     if (
         person.etype == "Instructors"
-        and person.job_profile
-        not in (
-            "Atelier Instructor",
-            "Special Programs Instructor",
-            "YASP & Atelier Youth Programs Instructor",
-        )
+        and person.job_profile not in INSTRUCTOR_PROFILES
         and person.job_profile not in fac_depts
     ):
-        warn(
+        warnings.add(
+            "Instructor who is not a Special Programs Instructor",
+            person.job_profile,
+            person.username,
             (
                 "Instructor {} is not a Special Programs Instructor, check record."
-            ).format(person.username)
+            ).format(person.username),
         )
 
     patron: dict[str, str] = {
-        "branchcode": "SF",
+        "branchcode": branchcode,
         "categorycode": category.get(person.etype or person.etype_future or "Staff")
         or "STAFF",
         # fill in Prox number if we have it, or default to UID
         "cardnumber": prox_map.get(person.universal_id, person.universal_id).strip(),
         "dateenrolled": today.isoformat(),
-        "dateexpiry": expiration_date(person, end_date),
+        "dateexpiry": expiration_date(person, end_date, warnings),
         "email": person.work_email,
         "firstname": person.first_name,
         "patron_attributes": "UNIVID:" + person.universal_id,
@@ -206,20 +412,258 @@ def make_employee_row(
         patron["patron_attributes"] += ",FACDEPT:{}".format(code)
     elif prodep:
         # there's a non-empty program/department value we haven't accounted for
-        warn(
+        warnings.add(
+            "No koha_mappings.fac_depts mapping for program/department",
+            prodep,
+            person.username,
             """No mapping in koha_mappings.fac_depts for faculty/staff prodep
-        "{}", see patron {}""".format(prodep, person.username)
+        "{}", see patron {}""".format(prodep, person.username),
         )
 
     if prodep is None:
-        warn(
-            "Employee {} has no academic program or department:".format(person.username)
+        warnings.add(
+            "Employee without academic program or department",
+            person.job_profile,
+            person.username,
+            "Employee {} has no academic program or department:\n{}".format(
+                person.username, person
+            ),
         )
-        print(person)
 
     return patron
 
 
+# Batch mode: validate a whole file at once, then filter & map column by
+# column instead of record by record. Mappings are looked up once per unique
+# value. Output (including warnings) is identical to the make_*_row functions.
+def columns(records: list, fields: tuple[str, ...]) -> dict[str, list]:
+    return {field: [getattr(r, field) for r in records] for field in fields}
+
+
+def select(cols: dict[str, list], mask: list[bool]) -> dict[str, list]:
+    return {field: list(compress(values, mask)) for field, values in cols.items()}
+
+
+def rows_from_columns(cols: dict[str, list]) -> list[dict]:
+    fields: list[str] = list(cols)
+    return [dict(zip(fields, values)) for values in zip(*cols.values())]
+
+
+def program_major(programs: list[dict[str, str]]) -> str | None:
+    for program in programs:
+        if program["program"] in stu_major:
+            return str(stu_major[program["program"]])
+    return None
+
+
+def make_student_rows(
+    student_dicts: list[dict[str, Any]] | list[Student],
+    prox_map: dict[str, str],
+    end_date: str,
+) -> list[dict]:
+    from pydantic import TypeAdapter
+
+    from workday.models import Student
+
+    students: list[Student] = TypeAdapter(list[Student]).validate_python(student_dicts)
+    c: dict[str, list] = columns(
+        students,
+        (
+            "academic_level",
+            "first_name",
+            "inst_email",
+            "last_name",
+            "primary_program",
+            "programs",
+            "student_id",
+            "universal_id",
+            "username",
+        ),
+    )
+    exceptions: set[str] = set(EXCEPTIONS)
+    c = select(
+        c,
+        [
+            username not in exceptions and email is not None and last is not None
+            for username, email, last in zip(
+                c["username"], c["inst_email"], c["last_name"]
+            )
+        ],
+    )
+
+    major_of: dict[str, str] = {
+        p: str(stu_major[p]) for p in set(c["primary_program"]) if p in stu_major
+    }
+    majors: list[str | None] = [
+        major_of.get(primary) or program_major(programs)
+        for primary, programs in zip(c["primary_program"], c["programs"])
+    ]
+    for i in (i for i, major in enumerate(majors) if major is None):
+        report.add(
+            "Unmapped student major",
+            c["primary_program"][i],
+            c["username"][i],
+            f"""Unable to parse major for student {c["username"][i]}
+Primary program: {c["primary_program"][i]}
+Program credentials: {c["programs"][i]}""",
+        )
+
+    category_of: dict[str, str] = {
+        level: category[level] for level in set(c["academic_level"])
+    }
+    n: int = len(c["username"])
+    return rows_from_columns(
+        {
+            "branchcode": [branchcode] * n,
+            "categorycode": [category_of[level] for level in c["academic_level"]],
+            "cardnumber": [prox_map.get(u, u).strip() for u in c["universal_id"]],
+            "dateenrolled": [today.isoformat()] * n,
+            "dateexpiry": [end_date] * n,
+            "email": c["inst_email"],
+            "firstname": c["first_name"],
+            "patron_attributes": [
+                f"UNIVID:{u},STUID:{s}" + (f",STUDENTMAJ:{m}" if m is not None else "")
+                for u, s, m in zip(c["universal_id"], c["student_id"], majors)
+            ],
+            "surname": c["last_name"],
+            "userid": c["username"],
+        }
+    )
+
+
+def make_employee_rows(
+    person_dicts: list[dict[str, Any]] | list[Employee],
+    prox_map: dict[str, str],
+    end_date: str,
+) -> list[dict]:
+    from pydantic import TypeAdapter
+
+    from workday.models import Employee
+
+    people: list[Employee] = TypeAdapter(list[Employee]).validate_python(person_dicts)
+    c: dict[str, list] = columns(
+        people,
+        (
+            "active_status",
+            "department",
+            "etype",
+            "etype_future",
+            "first_name",
+            "is_contingent",
+            "job_profile",
+            "last_name",
+            "program",
+            "universal_id",
+            "username",
+            "work_email",
+            "work_phone",
+        ),
+    )
+    c["person"] = people
+    exceptions: set[str] = set(EXCEPTIONS)
+    c = select(
+        c,
+        [
+            username not in exceptions
+            and active
+            and bool(email)
+            and etype not in ("Contingent Employees/Contractors", "Students")
+            and job_profile != "Special Programs Instructor (inactive)"
+            # matches employee_included, is_contingent is a bool so never "1"
+            and contingent != "1"
+            for username, active, email, etype, job_profile, contingent in zip(
+                c["username"],
+                c["active_status"],
+                c["work_email"],
+                c["etype"],
+                c["job_profile"],
+                c["is_contingent"],
+            )
+        ],
+    )
+
+    for i, (etype, job_profile) in enumerate(zip(c["etype"], c["job_profile"])):
+        if (
+            etype == "Instructors"
+            and job_profile not in INSTRUCTOR_PROFILES
+            and job_profile not in fac_depts
+        ):
+            report.add(
+                "Instructor who is not a Special Programs Instructor",
+                job_profile,
+                c["username"][i],
+                (
+                    "Instructor {} is not a Special Programs Instructor, check record."
+                ).format(c["username"][i]),
+            )
+
+    # expiration_date adds warnings for people without etypes & faculty when
+    # the end date is atypical, otherwise the cached semester_expiry suffices
+    etypes: list[str | None] = [
+        etype or future for etype, future in zip(c["etype"], c["etype_future"])
+    ]
+    expiries: list[str] = [
+        expiration_date(person, end_date)
+        if not etype
+        or (etype not in ("Instructors", "Staff") and not typical_semester(end_date))
+        else semester_expiry(etype, end_date)
+        for person, etype in zip(c["person"], etypes)
+    ]
+
+    prodeps: list[str | None] = [
+        program or department or (job_profile if job_profile in fac_depts else None)
+        for program, department, job_profile in zip(
+            c["program"], c["department"], c["job_profile"]
+        )
+    ]
+    attributes: list[str] = []
+    for i, (uid, prodep) in enumerate(zip(c["universal_id"], prodeps)):
+        if prodep and prodep in fac_depts:
+            attributes.append(f"UNIVID:{uid},FACDEPT:{fac_depts[prodep]}")
+            continue
+        attributes.append("UNIVID:" + uid)
+        if prodep:
+            report.add(
+                "No koha_mappings.fac_depts mapping for program/department",
+                prodep,
+                c["username"][i],
+                """No mapping in koha_mappings.fac_depts for faculty/staff prodep
+        "{}", see patron {}""".format(prodep, c["username"][i]),
+            )
+        if prodep is None:
+            report.add(
+                "Employee without academic program or department",
+                c["job_profile"][i],
+                c["username"][i],
+                "Employee {} has no academic program or department:\n{}".format(
+                    c["username"][i], c["person"][i]
+                ),
+            )
+
+    n: int = len(c["username"])
+    return rows_from_columns(
+        {
+            "branchcode": [branchcode] * n,
+            "categorycode": [category.get(e or "Staff") or "STAFF" for e in etypes],
+            "cardnumber": [prox_map.get(u, u).strip() for u in c["universal_id"]],
+            "dateenrolled": [today.isoformat()] * n,
+            "dateexpiry": expiries,
+            "email": c["work_email"],
+            "firstname": c["first_name"],
+            "patron_attributes": attributes,
+            "phone": [phone or "" for phone in c["work_phone"]],
+            "surname": c["last_name"],
+            "userid": c["username"],
+        }
+    )
+
+
+def load_people(path: str, use_cache: bool) -> list[Person]:
+    from workday.cache import load_people
+
+    return load_people(path, use_cache)
+
+
 def file_exists(fn) -> bool:
     if not os.path.exists(fn):
         warn(f'Did not find "{fn}" file')
@@ -233,17 +677,23 @@ def proc_students(
     koha_fields: list[str],
     prox_map: dict[str, str],
     end_date: str,
+    batch: bool = False,
+    use_cache: bool = True,
 ) -> None:
     if file_exists(student_file):
         print("Adding students to Koha patron CSV.")
-        with open(student_file, "r") as fh:
-            students: list[dict] = get_entries(json.load(fh))
-            with open(output_file, "a") as output:
-                writer = csv.DictWriter(output, fieldnames=koha_fields)
-                for stu in students:
-                    row: dict | None = make_student_row(stu, prox_map, end_date)
-                    if row:
-                        writer.writerow(row)
+        students: list[Student] = load_people(student_file, use_cache)  # type: ignore
+        with open_text(output_file, "a") as output:
+            writer = csv.DictWriter(output, fieldnames=koha_fields)
+            if batch:
+                writer.writerows(
+                    filter(emit, make_student_rows(students, prox_map, end_date))
+                )
+                return
+            for stu in students:
+                row: dict | None = make_student_row(stu, prox_map, end_date)
+                if emit(row):
+                    writer.writerow(row)
 
 
 def proc_staff(
@@ -252,28 +702,35 @@ def proc_staff(
     koha_fields: list[str],
     prox_map: dict[str, str],
     end_date: str,
+    batch: bool = False,
+    use_cache: bool = True,
 ) -> None:
     if file_exists(employee_file):
         print("Adding Faculty/Staff to Koha patron CSV.")
-        with open(employee_file, "r") as file:
-            employees: list[dict] = get_entries(json.load(file))
-            # open in append mode & don't add header row
-            with open(output_file, "a") as output:
-                writer = csv.DictWriter(output, fieldnames=koha_fields)
-                for employee in employees:
-                    row: dict | None = make_employee_row(employee, prox_map, end_date)
-                    if row:
-                        writer.writerow(row)
+        employees: list[Employee] = load_people(employee_file, use_cache)  # type: ignore
+        # open in append mode & don't add header row
+        with open_text(output_file, "a") as output:
+            writer = csv.DictWriter(output, fieldnames=koha_fields)
+            if batch:
+                writer.writerows(
+                    filter(emit, make_employee_rows(employees, prox_map, end_date))
+                )
+                return
+            for employee in employees:
+                row: dict | None = make_employee_row(employee, prox_map, end_date)
+                if emit(row):
+                    writer.writerow(row)
 
 
 @click.command()
-@click.argument("prox_report", type=click.Path(exists=True, readable=True))
+@click.argument(
+    "prox_report", required=False, type=click.Path(exists=True, readable=True)
+)
 @click.help_option("-h", "--help")
 @click.option(
     "--end",
     "end_date",
-    required=True,
-    help="Last day of the semester in YYYY-MM-DD format",
+    help="Last day of the semester in YYYY-MM-DD format, required to write a CSV",
 )
 @click.option(
     "--student-data",
@@ -291,17 +748,94 @@ def proc_staff(
     "--output",
     "output_file",
     default=lambda: os.environ.get("OUTPUT_FILE", "patron_bulk_import.csv"),
-    help="Path to output CSV file (default: OUTPUT_FILE env var or patron_bulk_import.csv)",
+    help="Path to output CSV file, compressed if it ends in .gz or .zst (default: OUTPUT_FILE env var or patron_bulk_import.csv)",
     type=click.Path(readable=True),
 )
+@click.option(
+    "--batch",
+    help="Transform each file column by column in one batch, faster for large files",
+    is_flag=True,
+)
+@click.option(
+    "--manifest",
+    "manifest_file",
+    default="patron_bulk_import.manifest.json",
+    show_default=True,
+    help="Fingerprints of imported rows, only new or changed patrons are written",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--commit-manifest",
+    help="Record the last CSV as imported in the manifest after Koha imported it, writes no CSV",
+    is_flag=True,
+)
+@click.option(
+    "--rejected",
+    "rejected_file",
+    help="With --commit-manifest, file of userids Koha rejected (one per line) to leave out",
+    type=click.Path(dir_okay=False, exists=True, readable=True),
+)
+@click.option(
+    "--full",
+    help="Write every patron, not only those new or changed since the last CSV",
+    is_flag=True,
+)
+@click.option(
+    "--no-cache",
+    help="Re-parse Workday files instead of using cached validated records",
+    is_flag=True,
+)
+@click.option(
+    "--branch",
+    default="SF",
+    show_default=True,
+    help="Koha library code new patrons belong to",
+)
+@click.option(
+    "-v",
+    "--verbose",
+    help="Print each warning as it happens in addition to the summary",
+    is_flag=True,
+)
+@click.option(
+    "--warnings-file",
+    help="Write the warnings summary to this file instead of the terminal",
+    type=click.Path(dir_okay=False, writable=True),
+)
 def main(
-    prox_report: str,
-    end_date: str,
+    prox_report: str | None,
+    end_date: str | None,
     student_data: str,
     employee_data: str,
     output_file: str,
+    batch: bool,
+    manifest_file: str,
+    full: bool,
+    commit_manifest: bool,
+    rejected_file: str | None,
+    no_cache: bool,
+    branch: str,
+    verbose: bool,
+    warnings_file: str | None,
 ) -> None:
     """Convert Workday JSON data into Koha patron import CSV. PROX_REPORT is the path to the prox report CSV."""
+    global branchcode, manifest
+    if rejected_file and not commit_manifest:
+        raise click.UsageError("--rejected only applies to --commit-manifest")
+    if commit_manifest:
+        if not os.path.exists(manifest_file):
+            raise click.UsageError(f"No manifest at {manifest_file} to commit")
+        rejected: list[str] = []
+        if rejected_file:
+            with open(rejected_file) as file:
+                rejected = [line.strip() for line in file if line.strip()]
+        Manifest(manifest_file).commit(rejected)
+        return
+    if not prox_report or not end_date:
+        raise click.UsageError("PROX_REPORT and --end are required to write a CSV")
+    branchcode = branch
+    report.verbose = verbose
+    manifest = Manifest(manifest_file, full)
     prox_map: dict[str, str] = create_prox_map(prox_report)
     koha_fields: list[str] = [
         "branchcode",
@@ -319,13 +853,20 @@ def main(
     ]
 
     # write header row
-    with open(output_file, "w+") as output:
+    with open_text(output_file, "w+") as output:
         writer = csv.DictWriter(output, fieldnames=koha_fields)
         writer.writeheader()
 
-    proc_students(student_data, output_file, koha_fields, prox_map, end_date)
-    proc_staff(employee_data, output_file, koha_fields, prox_map, end_date)
+    use_cache: bool = not no_cache
+    proc_students(
+        student_data, output_file, koha_fields, prox_map, end_date, batch, use_cache
+    )
+    proc_staff(
+        employee_data, output_file, koha_fields, prox_map, end_date, batch, use_cache
+    )
 
+    report.write(warnings_file)
+    manifest.save()
     print(
         "Done! Upload the CSV at https://library-staff.cca.edu/cgi-bin/koha/tools/import_borrowers.pl"
     )
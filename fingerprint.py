@@ -0,0 +1,37 @@
+"""Keyed fingerprints of personal data (universal IDs, card numbers, names,
+Workday records) for the state files that let syncs skip unchanged people.
+A plain hash of a 7-digit ID can be reversed by trying every ID, so values
+are hashed with HMAC-SHA256 and a secret: `fingerprint_key` in
+koha_patron/config.py, or otherwise a random key generated once in
+.fingerprint_key. Without the key the state files can't be matched to people;
+deleting it makes the next sync treat everyone as changed."""
+
+import hashlib
+import hmac
+import os
+import secrets
+from functools import cache
+from pathlib import Path
+
+KEY_FILE = Path(".fingerprint_key")
+
+
+@cache
+def key() -> bytes:
+    try:
+        from koha_patron.config import config
+
+        if config.get("fingerprint_key"):
+            return config["fingerprint_key"].encode()
+    except ImportError:
+        pass
+    if not KEY_FILE.exists():
+        # readable only by us, like the config with the API secret
+        descriptor: int = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "w") as file:
+            file.write(secrets.token_hex(32))
+    return KEY_FILE.read_text().strip().encode()
+
+
+def fingerprint(value: str) -> str:
+    return hmac.new(key(), value.encode(), hashlib.sha256).hexdigest()[:16]
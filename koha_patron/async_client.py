@@ -0,0 +1,141 @@
+"""asyncio Koha API client for jobs that need many requests in flight at once.
+Mirrors the blocking request_wrapper/Patron API with one pooled connection
+per host and a semaphore bounding concurrent requests."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import httpx
+
+from .patron import PATRON_READ_ONLY_FIELDS
+from .transport import ssl_verify
+
+# ByWater's SSL cert causes problems, same workaround as request_wrapper
+verify: bool = ssl_verify(default=False)
+
+
+def strip_read_only(patron: dict[str, Any]) -> dict[str, Any]:
+    # Koha rejects PUTs that include read-only fields
+    return {k: v for k, v in patron.items() if k not in PATRON_READ_ONLY_FIELDS}
+
+
+class AsyncKoha:
+    """Async Koha API client. Use as an async context manager:
+
+    async with AsyncKoha(concurrency=100) as koha:
+        patrons = await asyncio.gather(*(koha.get(id) for id in ids))
+
+    api_root, client_id and client_secret default to koha_patron.config."""
+
+    def __init__(
+        self,
+        api_root: str | None = None,
+        client_id: str | None = None,
+        client_secret: str | None = None,
+        concurrency: int = 50,
+        timeout: float = 30.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        if api_root is None or client_id is None or client_secret is None:
+            from .config import config
+
+            api_root = api_root or config["api_root"]
+            client_id = client_id or config["client_id"]
+            client_secret = client_secret or config["client_secret"]
+        self.api_root: str = api_root.rstrip("/")
+        self.client_id: str = client_id
+        self.client_secret: str = client_secret
+        self.concurrency: int = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # pool size matches the semaphore so every permitted request has a
+        # warm keep-alive connection available
+        self.client = httpx.AsyncClient(
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            timeout=timeout,
+            transport=transport,
+            verify=verify,
+        )
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> AsyncKoha:
+        await self.authenticate()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def get_token(self) -> str:
+        """Acquire an OAuth token for Koha (see oauth.get_token)"""
+        response: httpx.Response = await self.client.post(
+            self.api_root + "/oauth/token",
+            data={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type": "client_credentials",
+            },
+            # form-encoded body, not the client's default JSON content type
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response.raise_for_status()
+        return str(response.json()["access_token"])
+
+    async def authenticate(self) -> None:
+        token: str = await self.get_token()
+        self.client.headers["Authorization"] = "Bearer " + token
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Make an API request, refreshing the OAuth token once if it expired"""
+        async with self.semaphore:
+            sent_auth: str | None = self.client.headers.get("Authorization")
+            response: httpx.Response = await self.client.request(
+                method, self.api_root + path, **kwargs
+            )
+            if response.status_code == 401:
+                # only one coroutine refreshes, the rest reuse its new token
+                async with self._token_lock:
+                    if self.client.headers.get("Authorization") == sent_auth:
+                        await self.authenticate()
+                response = await self.client.request(
+                    method, self.api_root + path, **kwargs
+                )
+        response.raise_for_status()
+        return response
+
+    async def search(self, **params) -> list[dict[str, Any]]:
+        """Search patrons e.g. search(userid="ephetteplace", _match="exact")"""
+        response = await self.request("GET", "/patrons", params=params)
+        return response.json()
+
+    async def get(self, patron_id: int | str) -> dict[str, Any]:
+        response = await self.request("GET", f"/patrons/{patron_id}")
+        return response.json()
+
+    async def put(self, patron: dict[str, Any]) -> dict[str, Any]:
+        response = await self.request(
+            "PUT", f"/patrons/{patron['patron_id']}", json=strip_read_only(patron)
+        )
+        return response.json()
+
+    async def post(self, patron: dict[str, Any]) -> dict[str, Any]:
+        response = await self.request("POST", "/patrons", json=patron)
+        return response.json()
+
+    async def delete(self, patron_id: int | str) -> None:
+        await self.request("DELETE", f"/patrons/{patron_id}")
+
+    async def extended_attributes(self, patron_id: int | str) -> list[dict[str, Any]]:
+        response = await self.request(
+            "GET", f"/patrons/{patron_id}/extended_attributes"
+        )
+        return response.json()
@@ -0,0 +1,207 @@
+"""Benchmark Koha session transports against a local stand-in server that
+simulates a connection handshake (like TLS to ByWater) and limited bandwidth.
+Compares a new session per request (what Patron methods used to do), a plain
+shared requests.Session, the same without compression, and the pooled
+transport request_wrapper uses. Run `uv run python -m koha_patron.bench_transport`."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import click
+import requests
+
+from .transport import configure
+
+
+def fake_patron(i: int) -> dict:
+    return {
+        "patron_id": i,
+        "userid": f"patron{i}",
+        "cardnumber": str(10000 + i),
+        "firstname": "First",
+        "surname": f"Patron {i}",
+        "category_id": "STAFF",
+        "library_id": "SF",
+        "expiry_date": "2030-01-01",
+        "email": f"patron{i}@cca.edu",
+        "expired": False,
+        "restricted": False,
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1 & a Content-Length on every response
+    protocol_version = "HTTP/1.1"
+    server: StandIn
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connected()
+
+    def reply(self, body: bytes, encoding: str | None = None) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if self.server.bandwidth:
+            time.sleep(len(body) / self.server.bandwidth)
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            self.reply(self.server.page_gzip, "gzip")
+        else:
+            self.reply(self.server.page)
+
+    def do_PUT(self) -> None:
+        self.reply(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class StandIn(ThreadingHTTPServer):
+    """Koha stand-in serving one /patrons page for every GET and echoing PUTs.
+    handshake: seconds added to every new connection
+    bandwidth: bytes per second per response, None for unlimited"""
+
+    daemon_threads = True
+    # the default backlog of 5 resets connections when many open at once
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        handshake: float = 0.0,
+        bandwidth: float | None = None,
+        page_size: int = 500,
+    ):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.handshake: float = handshake
+        self.bandwidth: float | None = bandwidth
+        self.page: bytes = json.dumps(
+            [fake_patron(i) for i in range(page_size)]
+        ).encode()
+        self.page_gzip: bytes = gzip.compress(self.page)
+        self.connections: int = 0
+        self._lock = threading.Lock()
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+        time.sleep(self.handshake)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> StandIn:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def uncompressed() -> requests.Session:
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = "identity"
+    return session
+
+
+def measure(
+    server: StandIn,
+    session: Callable[[], requests.Session],
+    method: str,
+    requests_count: int,
+    threads: int,
+    shared: bool = True,
+) -> tuple[float, int]:
+    """Returns requests per second & connections opened"""
+    one: requests.Session = session()
+    body: dict = fake_patron(1)
+
+    def request(_) -> None:
+        http: requests.Session = one if shared else session()
+        if method == "GET":
+            http.get(server.url + "/patrons").json()
+        else:
+            http.put(server.url + "/patrons/1", json=body).json()
+        if not shared:
+            http.close()
+
+    before: int = server.connections
+    start: float = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(request, range(requests_count)))
+    elapsed: float = time.perf_counter() - start
+    one.close()
+    return requests_count / elapsed, server.connections - before
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.option("-n", "--requests", "requests_count", default=200, show_default=True)
+@click.option("-t", "--threads", default=16, show_default=True)
+@click.option(
+    "--handshake",
+    default=0.05,
+    show_default=True,
+    help="Seconds to open a connection",
+)
+@click.option(
+    "--bandwidth",
+    default=5_000_000,
+    show_default=True,
+    help="Bytes per second per response",
+)
+@click.option(
+    "--page-size", default=500, show_default=True, help="Patrons per GET page"
+)
+def main(
+    requests_count: int,
+    threads: int,
+    handshake: float,
+    bandwidth: float,
+    page_size: int,
+):
+    """Compare page-fetch & PUT throughput of Koha session transports"""
+    transports: list[tuple[str, Callable[[], requests.Session], bool]] = [
+        ("session per request", requests.Session, False),
+        ("shared requests.Session", requests.Session, True),
+        ("shared, uncompressed", uncompressed, True),
+        (
+            f"pooled transport ({threads})",
+            lambda: configure(requests.Session(), pool_size=threads),
+            True,
+        ),
+    ]
+    with StandIn(handshake, bandwidth, page_size) as server:
+        print(
+            f"{requests_count} requests, {threads} threads, {handshake}s handshake, "
+            f"{len(server.page):,} byte pages ({len(server.page_gzip):,} gzipped)\n"
+        )
+        print(f"{'transport':<28} {'GET/s':>8} {'conns':>6} {'PUT/s':>8} {'conns':>6}")
+        for name, session, shared in transports:
+            get_rate, get_conns = measure(
+                server, session, "GET", requests_count, threads, shared
+            )
+            put_rate, put_conns = measure(
+                server, session, "PUT", requests_count, threads, shared
+            )
+            print(
+                f"{name:<28} {get_rate:>8.1f} {get_conns:>6} {put_rate:>8.1f} {put_conns:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Record Koha API traffic to a "cassette" JSON file and replay it later with
+artificial latency, so syncs can be benchmarked without network access.
+
+Set KOHA_CASSETTE to the cassette path and KOHA_CASSETTE_MODE to "record" or
+"replay" (the default) to make request_wrapper and oauth.get_token use it.
+KOHA_REPLAY_LATENCY adds a delay in seconds to every replayed response.
+Cassettes contain patron data, delete them like the other data files."""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# never write credentials or tokens to a cassette
+REDACTED_HEADERS: tuple[str, ...] = ("Authorization", "Set-Cookie")
+# nor the tokens in /oauth/token response bodies, replay only needs a value
+REDACTED_FIELDS: tuple[str, ...] = ("access_token", "refresh_token")
+REDACTED: str = "redacted"
+
+
+def redact_body(body: str) -> str:
+    """Replace token fields in a JSON object response body"""
+    try:
+        data: Any = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict) or not any(f in data for f in REDACTED_FIELDS):
+        return body
+    return json.dumps(
+        {k: REDACTED if k in REDACTED_FIELDS else v for k, v in data.items()}
+    )
+
+
+class Cassette(BaseAdapter):
+    """Transport adapter that records or replays request/response pairs.
+    Replayed responses are matched by method and URL, in recorded order."""
+
+    def __init__(self, path: str | Path, mode: str = "replay", latency: float = 0.0):
+        super().__init__()
+        if mode not in ("record", "replay"):
+            raise ValueError(f'Cassette mode must be "record" or "replay", not {mode}')
+        self.path = Path(path)
+        self.mode: str = mode
+        self.latency: float = latency
+        self.interactions: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._queues: dict[tuple[str, str], deque[dict[str, Any]]] = defaultdict(deque)
+        if mode == "record":
+            self._real = HTTPAdapter()
+            atexit.register(self.save)
+        else:
+            with open(self.path) as file:
+                self.interactions = json.load(file)
+            for interaction in self.interactions:
+                self._queues[
+                    self.key(interaction["method"], interaction["url"])
+                ].append(interaction)
+
+    @staticmethod
+    def key(method: str | None, url: str | None) -> tuple[str, str]:
+        return (str(method).upper(), str(url))
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if self.mode == "record":
+            response: Response = self._real.send(request, **kwargs)
+            with self._lock:
+                self.interactions.append(
+                    {
+                        "method": request.method,
+                        "url": request.url,
+                        "status": response.status_code,
+                        "headers": {
+                            k: v
+                            for k, v in response.headers.items()
+                            if k not in REDACTED_HEADERS
+                        },
+                        "body": redact_body(response.text),
+                        "elapsed": response.elapsed.total_seconds(),
+                    }
+                )
+            return response
+
+        with self._lock:
+            queue = self._queues[self.key(request.method, request.url)]
+            if not queue:
+                raise LookupError(
+                    f"No recorded response for {request.method} {request.url} in {self.path}"
+                )
+            interaction: dict[str, Any] = queue[0]
+            # keep the last response for requests repeated more than recorded
+            if len(queue) > 1:
+                queue.popleft()
+        if self.latency:
+            time.sleep(self.latency)
+        return self.build_response(request, interaction)
+
+    def build_response(
+        self, request: PreparedRequest, interaction: dict[str, Any]
+    ) -> Response:
+        response = Response()
+        response.status_code = interaction["status"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = interaction["body"].encode()
+        response.encoding = "utf-8"
+        response.url = str(request.url)
+        response.request = request
+        response.reason = "Replayed"
+        return response
+
+    def save(self) -> None:
+        if self.mode == "record":
+            with self._lock, open(self.path, "w") as file:
+                json.dump(self.interactions, file, indent=2)
+
+    def close(self) -> None:
+        if self.mode == "record":
+            self._real.close()
+
+
+# one cassette per process so the OAuth call & the session share it
+_from_env: Cassette | None = None
+
+
+def from_env() -> Cassette | None:
+    global _from_env
+    path: str | None = os.environ.get("KOHA_CASSETTE")
+    if path and _from_env is None:
+        _from_env = Cassette(
+            path,
+            mode=os.environ.get("KOHA_CASSETTE_MODE", "replay"),
+            latency=float(os.environ.get("KOHA_REPLAY_LATENCY", "0")),
+        )
+    return _from_env
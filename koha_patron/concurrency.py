@@ -0,0 +1,224 @@
+"""Adaptive limit on concurrent Koha requests. Uses additive increase,
+multiplicative decrease (AIMD) like TCP congestion control: the limit grows
+by about one request per round trip while Koha keeps up and is cut back when
+latency climbs or Koha returns 429/5xx responses. WorkQueue orders the
+requests a sync makes so the most important ones go first."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from requests import Response
+
+# longest we wait before retrying a 429, whatever Retry-After asks for
+MAX_RETRY_AFTER: float = 60.0
+
+
+def retry_after(response: Response, default: float) -> float:
+    """Seconds to wait before retrying, from Retry-After's seconds or
+    HTTP-date form, otherwise default. Capped at MAX_RETRY_AFTER."""
+    value: str | None = response.headers.get("Retry-After")
+    seconds: float = default
+    if value:
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                when: datetime = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                pass
+            else:
+                if when.tzinfo is None:
+                    when = when.replace(tzinfo=timezone.utc)
+                seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        retries: int = 3,
+        window: int = 100,
+    ):
+        self.limit: float = float(initial)
+        self.minimum: int = minimum
+        self.maximum: int = maximum
+        self.backoff: float = backoff
+        # latency this many times the best recent latency counts as congestion
+        self.latency_tolerance: float = latency_tolerance
+        self.retries: int = retries
+        self.in_flight: int = 0
+        # smoothed latency and the lowest smoothed latency of the last window
+        # requests, in seconds. A windowed minimum so one unusually fast
+        # response doesn't make every later one look slow.
+        self.latency: float | None = None
+        self.baseline: float | None = None
+        self._recent: deque[float] = deque(maxlen=window)
+        self.requests: int = 0
+        self.errors: int = 0
+        self.throttled: int = 0
+        # completions since the last decrease, so one burst of failures from
+        # requests that were already in flight only cuts the limit once
+        self._since_decrease: int = 0
+        self._limit_total: float = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, ok: bool = True, throttled: bool = False) -> None:
+        """Record a finished request and adjust the limit"""
+        with self._condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self._since_decrease += 1
+            if not ok or throttled:
+                self.errors += 1
+            if throttled:
+                self.throttled += 1
+
+            self.latency = (
+                latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            )
+            self._recent.append(self.latency)
+            self.baseline = min(self._recent)
+
+            congested: bool = (
+                not ok
+                or throttled
+                or self.latency > self.baseline * self.latency_tolerance
+            )
+            if congested:
+                if self._since_decrease >= int(self.limit):
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._since_decrease = 0
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            self._limit_total += self.limit
+            self._condition.notify_all()
+
+    def call(self, fn: Callable[..., Response], *args, **kwargs) -> Response:
+        """Make a request with fn (e.g. session.get) inside the limit,
+        retrying with backoff when Koha responds 429 Too Many Requests"""
+        attempt: int = 0
+        while True:
+            self.acquire()
+            start: float = time.perf_counter()
+            try:
+                response: Response = fn(*args, **kwargs)
+            except Exception:
+                self.release(time.perf_counter() - start, ok=False)
+                raise
+            self.release(
+                time.perf_counter() - start,
+                ok=response.status_code < 500,
+                throttled=response.status_code == 429,
+            )
+            if response.status_code != 429 or attempt >= self.retries:
+                return response
+            time.sleep(retry_after(response, 2**attempt))
+            attempt += 1
+
+    @property
+    def average(self) -> float:
+        return self._limit_total / self.requests if self.requests else self.limit
+
+    def report(self) -> str:
+        error_rate: float = self.errors / self.requests if self.requests else 0.0
+        latency: str = f"{self.latency * 1000:.0f}ms" if self.latency else "n/a"
+        return (
+            f"Concurrency converged on {int(self.limit)} (average {self.average:.1f}, "
+            f"max {self.maximum}), latency {latency}, error rate {error_rate:.1%}, "
+            f"{self.throttled} throttled"
+        )
+
+
+class WorkQueue:
+    """Priority queue of tasks run by a pool of worker threads. Lower
+    priorities run first, equal ones in the order they were put. Running tasks
+    may put more. When the budget (seconds from run) runs out, tasks that
+    haven't started and have a skip function get it called instead, tasks
+    without one still run."""
+
+    def __init__(self, workers: int, budget: float | None = None):
+        self.workers: int = workers
+        self.budget: float | None = budget
+        self.skipped: int = 0
+        self._deadline: float | None = None
+        # (priority, insertion order, task, skip)
+        self._heap: list[tuple] = []
+        self._order = itertools.count()
+        # queued plus running tasks, the workers stop when it reaches zero
+        self._unfinished: int = 0
+        self._error: BaseException | None = None
+        self._condition = threading.Condition()
+
+    def put(
+        self,
+        priority: Any,
+        task: Callable[[], Any],
+        skip: Callable[[], Any] | None = None,
+    ) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (priority, next(self._order), task, skip))
+            self._unfinished += 1
+            self._condition.notify()
+
+    @property
+    def out_of_time(self) -> bool:
+        return self._deadline is not None and time.perf_counter() >= self._deadline
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap and self._unfinished and not self._error:
+                    self._condition.wait()
+                if not self._heap or self._error:
+                    return
+                _, _, task, skip = heapq.heappop(self._heap)
+            try:
+                if skip and self.out_of_time:
+                    skip()
+                    with self._condition:
+                        self.skipped += 1
+                else:
+                    task()
+            except BaseException as error:
+                with self._condition:
+                    self._error = self._error or error
+            finally:
+                with self._condition:
+                    self._unfinished -= 1
+                    self._condition.notify_all()
+
+    def run(self) -> None:
+        """Work until every task has run or been skipped, re-raising the first
+        exception a task raised"""
+        if self.budget is not None:
+            self._deadline = time.perf_counter() + self.budget
+        threads: list[threading.Thread] = [
+            threading.Thread(target=self._work) for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._error:
+            raise self._error
@@ -1,30 +1,183 @@
-# shell out to `gsutil` to download JSON files from GSB
+# download Workday JSON files from GSB (or a local stand-in) in parallel,
+# skipping files that have not changed since the last download
+import base64
+import hashlib
+import json
+import shutil
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Protocol
+from urllib.parse import urlparse
+
+import click
 
 GS_BUCKET = "integration-success"
+FILES: tuple[str, ...] = ("student_data.json", "employee_data.json")
+# JSON lines log of every download, used to remember object generations
+LOG_FILE = "downloads.log"
+
+
+class Source(Protocol):
+    def describe(self, name: str) -> dict[str, Any]:
+        """Return the file's "generation", "md5" (base64, like GCS) & "size"."""
+        ...
+
+    def fetch(self, name: str, dest: Path) -> None: ...
+
+
+class GCloudSource:
+    """Shell out to `gcloud storage` for files in a Google Cloud bucket"""
+
+    def __init__(self, bucket: str = GS_BUCKET):
+        self.bucket: str = bucket
+
+    def describe(self, name: str) -> dict[str, Any]:
+        result = subprocess.run(
+            [
+                "gcloud",
+                "storage",
+                "objects",
+                "describe",
+                f"gs://{self.bucket}/{name}",
+                "--format=json",
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        info: dict[str, Any] = json.loads(result.stdout)
+        return {
+            "generation": str(info.get("generation")),
+            # composite objects have no MD5, we fall back to generation
+            "md5": info.get("md5_hash") or info.get("md5Hash"),
+            "size": int(info.get("size", 0)),
+        }
+
+    def fetch(self, name: str, dest: Path) -> None:
+        subprocess.run(
+            ["gcloud", "storage", "cp", f"gs://{self.bucket}/{name}", str(dest)],
+            check=True,
+        )
+
+
+class LocalSource:
+    """Directory or file:// URL standing in for the bucket, e.g. for tests"""
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def describe(self, name: str) -> dict[str, Any]:
+        path: Path = self.directory / name
+        return {
+            "generation": str(path.stat().st_mtime_ns),
+            "md5": md5(path),
+            "size": path.stat().st_size,
+        }
+
+    def fetch(self, name: str, dest: Path) -> None:
+        shutil.copyfile(self.directory / name, dest)
+
+
+def source_for(uri: str) -> Source:
+    parsed = urlparse(uri)
+    if parsed.scheme == "gs":
+        return GCloudSource(parsed.netloc)
+    if parsed.scheme == "file":
+        return LocalSource(parsed.path)
+    return LocalSource(uri)
+
+
+def md5(path: Path) -> str:
+    # base64 digest to match the md5_hash GCS reports
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return base64.b64encode(digest.digest()).decode()
+
+
+def last_generations(log: Path) -> dict[str, str]:
+    generations: dict[str, str] = {}
+    if log.exists():
+        with open(log) as file:
+            for line in file:
+                entry: dict[str, Any] = json.loads(line)
+                generations[entry["file"]] = entry["generation"]
+    return generations
+
+
+def unchanged(remote: dict[str, Any], dest: Path, last_generation: str | None) -> bool:
+    if not dest.exists():
+        return False
+    if remote["md5"]:
+        return remote["md5"] == md5(dest)
+    return remote["generation"] == last_generation
+
+
+def download(
+    source: Source, name: str, dest_dir: Path, last_generation: str | None, force: bool
+) -> dict[str, Any]:
+    start: float = time.perf_counter()
+    dest: Path = dest_dir / name
+    remote: dict[str, Any] = source.describe(name)
+    skipped: bool = not force and unchanged(remote, dest, last_generation)
+    if not skipped:
+        source.fetch(name, dest)
+    return {
+        "file": name,
+        "skipped": skipped,
+        "bytes": 0 if skipped else remote["size"],
+        "seconds": round(time.perf_counter() - start, 3),
+        "generation": remote["generation"],
+        "at": datetime.now().isoformat(timespec="seconds"),
+    }
+
 
+@click.command()
+@click.help_option("--help", "-h")
+@click.option(
+    "-s",
+    "--source",
+    default=f"gs://{GS_BUCKET}",
+    show_default=True,
+    help="gs:// bucket, file:// URL, or directory to download from",
+)
+@click.option(
+    "-d",
+    "--dest",
+    default=".",
+    show_default=True,
+    help="Directory to download into",
+    type=click.Path(file_okay=False, exists=True, writable=True, path_type=Path),
+)
+@click.option(
+    "-f", "--force", help="Download even if files are unchanged", is_flag=True
+)
+def main(source: str, dest: Path, force: bool) -> None:
+    """Download student and employee data concurrently."""
+    log: Path = dest / LOG_FILE
+    generations: dict[str, str] = last_generations(log)
+    src: Source = source_for(source)
+    with ThreadPoolExecutor(max_workers=len(FILES)) as pool:
+        entries: list[dict[str, Any]] = list(
+            pool.map(
+                lambda name: download(src, name, dest, generations.get(name), force),
+                FILES,
+            )
+        )
 
-def main() -> None:
-    # always download student and employee data
-    subprocess.run(
-        [
-            "gcloud",
-            "storage",
-            "cp",
-            f"gs://{GS_BUCKET}/student_data.json",
-            ".",
-        ]
-    )
-
-    subprocess.run(
-        [
-            "gcloud",
-            "storage",
-            "cp",
-            f"gs://{GS_BUCKET}/employee_data.json",
-            ".",
-        ]
-    )
+    with open(log, "a") as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + "\n")
+            if entry["skipped"]:
+                print(f"{entry['file']} unchanged, skipped ({entry['seconds']}s)")
+            else:
+                print(
+                    f"Downloaded {entry['file']}: {entry['bytes']:,} bytes in {entry['seconds']}s"
+                )
 
 
 if __name__ == "__main__":
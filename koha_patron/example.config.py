@@ -2,4 +2,18 @@ config: dict[str, str] = {
     "api_root": "https://library.cca.edu/api/v1",
     "client_id": "abcedfg-123445678",
     "client_secret": "abcedfg-123445678",
+    # secret for the keyed hashes in sync state files (see fingerprint.py), any
+    # long random string e.g. `python -c "import secrets; print(secrets.token_hex())"`
+    "fingerprint_key": "",
+}
+
+# optional Koha instances patron_update.py --target syncs, each only needs the
+# keys that differ from config above
+targets: dict[str, dict[str, str]] = {
+    "production": {},
+    "staging": {
+        "api_root": "https://library-staging.cca.edu/api/v1",
+        "client_id": "abcedfg-123445678",
+        "client_secret": "abcedfg-123445678",
+    },
 }
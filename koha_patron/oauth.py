@@ -1,26 +1,43 @@
-import os
-
 import requests
+from requests.adapters import BaseAdapter
 from requests.exceptions import HTTPError
 
 from .config import config
+from .transport import TIMEOUT, ssl_verify
 
 # ByWater's SSL cert used to cause problems, this allows a workaround
-verify: bool = bool(os.environ.get("SSL_VERIFY", True))
+verify: bool = ssl_verify(default=True)
 
 
-def get_token() -> str | None:
+def get_token(transport: BaseAdapter | None = None) -> str | None:
     """Acquire an OAuth token for Koha
 
+    transport: optional requests adapter to send the request with, see
+    request_wrapper
+
     returns: OAuth token (str) or None if an error occurs"""
     data: dict[str, str] = {
         "client_id": config["client_id"],
         "client_secret": config["client_secret"],
         "grant_type": "client_credentials",
     }
-    response: requests.Response = requests.post(
-        config["api_root"] + "/oauth/token", data=data, verify=verify
-    )
+    with requests.Session() as session:
+        if transport:
+            session.mount("https://", transport)
+            session.mount("http://", transport)
+        try:
+            # like every other Koha request, so a hung endpoint can't stall a sync
+            response: requests.Response = session.post(
+                config["api_root"] + "/oauth/token",
+                data=data,
+                verify=verify,
+                timeout=TIMEOUT,
+            )
+        finally:
+            # the transport belongs to the caller, closing the session mustn't
+            # close it
+            if transport:
+                session.adapters.clear()
     try:
         response.raise_for_status()
     except HTTPError:
@@ -1,8 +1,12 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
-from typing import Literal
+from typing import TYPE_CHECKING, Any, Iterable, Literal
 
-from .config import config
-from .request_wrapper import request_wrapper
+if TYPE_CHECKING:
+    from requests import Session
 
 PATRON_READ_ONLY_FIELDS: tuple[
     Literal["anonymized"],
@@ -11,42 +15,108 @@ PATRON_READ_ONLY_FIELDS: tuple[
     Literal["updated_on"],
 ] = ("anonymized", "expired", "restricted", "updated_on")
 
+# session shared by Patrons created without one, so they share its connection
+# pool & OAuth token instead of each making their own
+_default_http: Session | None = None
+_default_http_lock = threading.Lock()
+
+
+def default_session() -> Session:
+    global _default_http
+    from .request_wrapper import request_wrapper
+
+    with _default_http_lock:
+        if _default_http is None:
+            _default_http = request_wrapper()
+            if _default_http is None:
+                raise Exception("Failed to create HTTP session")
+    return _default_http
+
 
 class Patron(SimpleNamespace):
-    def __init__(self, patron_id):
-        self.patron_id = patron_id
+    """Koha patron record. Data is loaded lazily: the record is only fetched
+    from the API the first time one of its fields is accessed, and extended
+    attributes only when `extended_attributes` is accessed. Patrons created
+    without an `http` session share one, see default_session."""
+
+    def __init__(self, patron_id, http: Session | None = None, **fields):
         if patron_id is None:
             raise Exception(
                 "Cannot instantiate Patron object without a Patron ID parameter."
             )
-        self.get()
+        self.patron_id = patron_id
+        # private attributes are never sent back to Koha, see remove_readonly_fields
+        self._http: Session | None = http
+        self._loaded: bool = bool(fields)
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def __getattr__(self, name: str) -> Any:
+        # only called when normal attribute lookup fails i.e. for unloaded fields
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name == "extended_attributes":
+            return self.get_attributes().__dict__[name]
+        if not self._loaded:
+            self.get()
+            return getattr(self, name)
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
+        )
 
     def __repr__(self):
         return "{} {} ({})".format(self.firstname, self.surname, self.patron_id)
 
+    @classmethod
+    def from_api_dict(cls, data: dict, http: Session | None = None) -> "Patron":
+        """Build a Patron from a record the API already returned, e.g. one
+        item of a /patrons search, without another request."""
+        return cls(http=http, **data)
+
+    @classmethod
+    def fetch_many(
+        cls, ids: Iterable[int | str], http: Session | None = None, workers: int = 8
+    ) -> list["Patron"]:
+        """Fetch several patrons concurrently over one shared session."""
+        from .request_wrapper import request_wrapper
+
+        if http is None:
+            http = request_wrapper(pool_size=workers)
+        patrons: list[Patron] = [cls(patron_id, http=http) for patron_id in ids]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda patron: patron.get(), patrons))
+
+    def session(self) -> Session:
+        # reuse the same session (& OAuth token) for every request this patron makes
+        if self._http is None:
+            self._http = default_session()
+        return self._http
+
     def remove_readonly_fields(self):
         # utility method, we must do this before attempting write API operations
-        patron = self.__dict__.copy()
+        patron = {
+            key: value
+            for key, value in self.__dict__.items()
+            if not key.startswith("_")
+        }
         for field in PATRON_READ_ONLY_FIELDS:
             patron.pop(field, None)
         return patron
 
     def delete(self):
-        http = request_wrapper()
-        if http is None:
-            raise Exception("Failed to create HTTP session")
-        response = http.delete(
+        from .config import config
+
+        response = self.session().delete(
             "{}/patrons/{}".format(config["api_root"], self.patron_id)
         )
         response.raise_for_status()
         return self
 
     def get(self):
-        # sync local object with Koha data from API, used in __init__
-        http = request_wrapper()
-        if http is None:
-            raise Exception("Failed to create HTTP session")
-        response = http.get(
+        # sync local object with Koha data from API, called on first field access
+        from .config import config
+
+        response = self.session().get(
             "{}/patrons/{}".format(
                 config["api_root"],
                 self.patron_id,
@@ -55,14 +125,14 @@ class Patron(SimpleNamespace):
         response.raise_for_status()
         for key, value in response.json().items():
             setattr(self, key, value)
+        self._loaded = True
         return self
 
     def get_attributes(self):
         # get all extended attributes
-        http = request_wrapper()
-        if http is None:
-            raise Exception("Failed to create HTTP session")
-        response = http.get(
+        from .config import config
+
+        response = self.session().get(
             "{}/patrons/{}/extended_attributes".format(
                 config["api_root"], self.patron_id
             )
@@ -73,10 +143,15 @@ class Patron(SimpleNamespace):
 
     def update(self):
         # sync local object to Koha
-        http = request_wrapper()
-        if http is None:
-            raise Exception("Failed to create HTTP session")
-        response = http.put(
+        from .config import config
+
+        if not self._loaded:
+            raise Exception(
+                "Cannot update Patron {} before it is loaded with get().".format(
+                    self.patron_id
+                )
+            )
+        response = self.session().put(
             "{}/patrons/{}".format(
                 config["api_root"],
                 self.patron_id,
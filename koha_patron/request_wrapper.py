@@ -1,23 +1,65 @@
+import threading
+
 import requests
 import urllib3
+from requests.adapters import BaseAdapter
 
+from .cassette import from_env
 from .oauth import get_token
+from .transport import configure, ssl_verify
 
-# ByWater's SSL cert causes problems so every request has verify=False
-# and we do this to silence printed warnings
+# ByWater's SSL cert causes problems so requests have verify=False unless
+# SSL_VERIFY is set, and we do this to silence printed warnings
+verify: bool = ssl_verify(default=False)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
-def request_wrapper() -> requests.Session | None:
-    token: str | None = get_token()
+def request_wrapper(
+    transport: BaseAdapter | None = None,
+    pool_size: int | None = None,
+    timeout: tuple[float, float] | None = None,
+) -> requests.Session | None:
+    """Create an authenticated session. transport replaces the default HTTP
+    adapter, e.g. a cassette.Cassette to record or replay traffic; if it is
+    None the KOHA_CASSETTE environment variable is checked. Otherwise the
+    session keeps up to pool_size connections alive, pass the number of
+    threads sharing it. When the OAuth token expires the session gets a new
+    one and retries the request once, so long-running scripts can keep one
+    session."""
+    transport = transport or from_env()
+    token: str | None = get_token(transport)
     if token:
         headers: dict[str, str] = {
             "Accept": "application/json",
             "Authorization": "Bearer " + token,
             "Content-Type": "application/json",
         }
-        session = requests.Session()
-        session.verify = False
+        session = configure(requests.Session(), pool_size, timeout)
+        session.verify = verify
         session.headers.update(headers)
+        if transport:
+            session.mount("https://", transport)
+            session.mount("http://", transport)
+        token_lock = threading.Lock()
+
+        def refresh_token(response: requests.Response, *args, **kwargs):
+            if response.status_code != 401 or getattr(
+                response.request, "retried", False
+            ):
+                return response
+            sent: str | None = response.request.headers.get("Authorization")
+            # only one thread refreshes, the rest reuse its new token
+            with token_lock:
+                if session.headers["Authorization"] == sent:
+                    new_token: str | None = get_token(transport)
+                    if new_token is None:
+                        return response
+                    session.headers["Authorization"] = "Bearer " + new_token
+            retry = response.request.copy()
+            retry.headers["Authorization"] = session.headers["Authorization"]
+            retry.retried = True  # type: ignore
+            return session.send(retry, **kwargs)
+
+        session.hooks["response"].append(refresh_token)
         return session
     return None
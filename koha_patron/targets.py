@@ -0,0 +1,36 @@
+"""Several Koha instances one run can sync the same Workday data to, e.g.
+production & staging. koha_patron/config.py may define `targets`, a dict of
+target names to the config keys (api_root, client_id, client_secret) that
+differ from `config`."""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+
+def available() -> dict[str, dict[str, str]]:
+    from . import config
+
+    return getattr(config, "targets", {})
+
+
+def settings(names: Iterable[str]) -> dict[str, dict[str, str]]:
+    """Complete config for each named target, in the order given"""
+    from .config import config
+
+    targets: dict[str, dict[str, str]] = available()
+    unknown: list[str] = [name for name in names if name not in targets]
+    if unknown:
+        raise KeyError(
+            f"No Koha target {', '.join(unknown)} in koha_patron/config.py, "
+            f"choose from: {', '.join(targets) or 'none defined'}"
+        )
+    return {name: {**config, **targets[name]} for name in names}
+
+
+def use(target: dict[str, str]) -> None:
+    """Point config, & so every session created afterwards, at a target. config
+    is global so each target must run in its own process."""
+    from .config import config
+
+    config.update(target)
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import httpx
+
+from koha_patron.async_client import AsyncKoha
+
+
+def mock_koha(requests: list[httpx.Request]) -> httpx.MockTransport:
+    tokens: list[str] = ["expired", "fresh"]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/api/v1/oauth/token":
+            return httpx.Response(200, json={"access_token": tokens.pop(0)})
+        if request.headers["Authorization"] == "Bearer expired":
+            return httpx.Response(401)
+        if request.method == "PUT":
+            return httpx.Response(200, json=json.loads(request.content))
+        return httpx.Response(200, json={"patron_id": 1, "expired": False})
+
+    return httpx.MockTransport(handler)
+
+
+def run(coroutine_fn):
+    async def wrapper():
+        async with AsyncKoha(
+            "https://koha.test/api/v1", "id", "secret", transport=transport
+        ) as koha:
+            return await coroutine_fn(koha)
+
+    requests: list[httpx.Request] = []
+    transport = mock_koha(requests)
+    return asyncio.run(wrapper()), requests
+
+
+def test_refreshes_expired_token():
+    patron, requests = run(lambda koha: koha.get(1))
+    assert patron["patron_id"] == 1
+    assert requests[-1].headers["Authorization"] == "Bearer fresh"
+    # token, 401, token refresh, retry
+    assert len(requests) == 4
+
+
+def test_put_strips_read_only_fields():
+    patron, _ = run(lambda koha: koha.put({"patron_id": 1, "expired": False}))
+    assert patron == {"patron_id": 1}
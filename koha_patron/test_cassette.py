@@ -0,0 +1,42 @@
+import json
+
+from requests import PreparedRequest, Request, Response
+from requests.adapters import BaseAdapter
+
+from koha_patron.cassette import Cassette
+
+
+class FakeKoha(BaseAdapter):
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        response = Response()
+        response.status_code = 200
+        response.request = request
+        if str(request.url).endswith("/oauth/token"):
+            body: dict = {"access_token": "live-token", "expires_in": 3600}
+        else:
+            body = {"patron_id": 1}
+        response._content = json.dumps(body).encode()
+        response.encoding = "utf-8"
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def test_recorded_tokens_are_redacted(tmp_path):
+    path = tmp_path / "cassette.json"
+    cassette = Cassette(path, mode="record")
+    cassette._real = FakeKoha()
+    for url in ("https://koha/api/v1/oauth/token", "https://koha/api/v1/patrons/1"):
+        cassette.send(Request("GET", url).prepare())
+    cassette.save()
+
+    assert "live-token" not in path.read_text()
+    token, patron = json.loads(path.read_text())
+    assert json.loads(token["body"]) == {"access_token": "redacted", "expires_in": 3600}
+    assert json.loads(patron["body"]) == {"patron_id": 1}
+
+    # replayed token responses still parse
+    replay = Cassette(path)
+    response = replay.send(Request("GET", "https://koha/api/v1/oauth/token").prepare())
+    assert response.json()["access_token"] == "redacted"
@@ -0,0 +1,111 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+from requests import Response
+
+from koha_patron.concurrency import (
+    MAX_RETRY_AFTER,
+    AdaptiveLimiter,
+    WorkQueue,
+    retry_after,
+)
+
+
+def finish(limiter: AdaptiveLimiter, n: int, latency: float, **kwargs) -> None:
+    for _ in range(n):
+        limiter.acquire()
+        limiter.release(latency, **kwargs)
+
+
+def test_limit_grows_while_latency_is_steady():
+    limiter = AdaptiveLimiter(initial=2, maximum=10)
+    finish(limiter, 200, 0.1)
+    assert int(limiter.limit) == 10
+
+
+def test_limit_halves_on_throttling():
+    limiter = AdaptiveLimiter(initial=8, maximum=10)
+    finish(limiter, 8, 0.1)
+    before: float = limiter.limit
+    finish(limiter, 1, 0.1, ok=False, throttled=True)
+    assert limiter.limit == before * 0.5
+    assert limiter.throttled == 1
+
+
+def test_limit_backs_off_when_latency_climbs():
+    limiter = AdaptiveLimiter(initial=8, maximum=10)
+    finish(limiter, 20, 0.1)
+    finish(limiter, 20, 1.0)
+    assert limiter.limit < 8
+
+
+def test_one_fast_response_does_not_pin_the_limit():
+    limiter = AdaptiveLimiter(initial=2, maximum=10, window=50)
+    finish(limiter, 1, 0.001)
+    finish(limiter, 300, 0.1)
+    assert int(limiter.limit) == 10
+
+
+def test_limit_never_drops_below_minimum():
+    limiter = AdaptiveLimiter(initial=4, minimum=2)
+    finish(limiter, 50, 0.1, ok=False)
+    assert limiter.limit == 2
+
+
+def throttled(retry: str | None) -> Response:
+    response = Response()
+    response.status_code = 429
+    if retry is not None:
+        response.headers["Retry-After"] = retry
+    return response
+
+
+def test_retry_after():
+    soon: str = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30))
+    assert retry_after(throttled("5"), 1) == 5
+    assert 25 < retry_after(throttled(soon), 1) <= 30
+    assert retry_after(throttled("Wed, 21 Oct 2015 07:28:00 GMT"), 1) == 0
+    assert retry_after(throttled("in a while"), 4) == 4
+    assert retry_after(throttled(None), 2) == 2
+    assert retry_after(throttled("3600"), 1) == MAX_RETRY_AFTER
+
+
+def test_work_queue_runs_by_priority():
+    ran: list[str] = []
+    queue = WorkQueue(workers=1)
+    queue.put(2, lambda: ran.append("verify"))
+    # tasks can queue more work, which jumps ahead of lower priorities
+    queue.put(1, lambda: queue.put(0, lambda: ran.append("update")))
+    queue.put(0, lambda: ran.append("card"))
+    queue.run()
+    assert ran == ["card", "update", "verify"]
+
+
+def test_work_queue_skips_tasks_when_out_of_time():
+    ran: list[int] = []
+    skipped: list[int] = []
+    queue = WorkQueue(workers=2, budget=0.05)
+    for i in range(20):
+        queue.put(
+            1,
+            lambda i=i: ran.append(i) or time.sleep(0.01),
+            lambda i=i: skipped.append(i),
+        )
+    # updates have no skip function so they always run
+    queue.put(2, lambda: ran.append(-1))
+    queue.run()
+    assert ran[-1] == -1
+    assert skipped and len(ran) + len(skipped) == 21
+    assert queue.skipped == len(skipped)
+    assert max(ran[:-1]) < min(skipped)
+
+
+def test_work_queue_reraises_task_errors():
+    queue = WorkQueue(workers=4)
+    queue.put(0, lambda: 1 / 0)
+    for _ in range(10):
+        queue.put(1, lambda: None)
+    with pytest.raises(ZeroDivisionError):
+        queue.run()
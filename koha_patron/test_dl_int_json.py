@@ -0,0 +1,24 @@
+import json
+
+from click.testing import CliRunner
+
+from koha_patron.dl_int_json import FILES, LOG_FILE, main
+
+
+def test_downloads_then_skips_unchanged(tmp_path):
+    bucket = tmp_path / "bucket"
+    bucket.mkdir()
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    for name in FILES:
+        (bucket / name).write_text('{"Report_Entry": []}')
+
+    args: list[str] = ["--source", bucket.as_uri(), "--dest", str(dest)]
+    runner = CliRunner()
+    assert runner.invoke(main, args).exit_code == 0
+    (bucket / FILES[0]).write_text('{"Report_Entry": [{}]}')
+    assert runner.invoke(main, args).exit_code == 0
+
+    entries = [json.loads(line) for line in (dest / LOG_FILE).read_text().splitlines()]
+    assert [e["skipped"] for e in entries] == [False, False, False, True]
+    assert (dest / FILES[0]).read_text() == '{"Report_Entry": [{}]}'
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+import requests
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+
+from koha_patron.transport import TIMEOUT
+
+config = pytest.importorskip("koha_patron.config").config
+
+
+class ExpiringKoha(BaseAdapter):
+    """Issues numbered tokens and rejects all but the latest one"""
+
+    def __init__(self):
+        super().__init__()
+        self.tokens: int = 0
+        self.closed: bool = False
+        # the timeout the last request was sent with
+        self.timeout = None
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        self.timeout = kwargs.get("timeout")
+        response = Response()
+        response.request = request
+        if str(request.url).endswith("/oauth/token"):
+            self.tokens += 1
+            response.status_code = 200
+            response._content = json.dumps({"access_token": str(self.tokens)}).encode()
+        elif request.headers["Authorization"] == f"Bearer {self.tokens}":
+            response.status_code = 200
+            response._content = b"[]"
+        else:
+            response.status_code = 401
+            response._content = b'{"error": "Token expired"}'
+        return response
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_expired_token_is_refreshed():
+    from koha_patron.request_wrapper import request_wrapper
+
+    koha = ExpiringKoha()
+    http = request_wrapper(koha)
+    assert http is not None
+    assert http.get(config["api_root"] + "/patrons").status_code == 200
+
+    # another client got a new token, e.g. the old one expired
+    koha.tokens += 1
+    assert http.get(config["api_root"] + "/patrons").status_code == 200
+    assert koha.tokens == 3
+    assert http.headers["Authorization"] == "Bearer 3"
+
+
+def test_token_session_is_closed(monkeypatch):
+    from koha_patron.oauth import get_token
+
+    closed: list[requests.Session] = []
+    close = requests.Session.close
+    monkeypatch.setattr(
+        requests.Session, "close", lambda self: closed.append(self) or close(self)
+    )
+    koha = ExpiringKoha()
+    assert get_token(koha) == "1"
+    assert koha.timeout == TIMEOUT
+    assert len(closed) == 1
+    # the caller's transport stays open for its own session
+    assert not koha.closed
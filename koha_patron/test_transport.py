@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from .bench_transport import StandIn
+from .transport import PooledAdapter, configure, parse_timeout, ssl_verify
+
+
+def test_threads_reuse_pooled_connections():
+    with StandIn(page_size=50) as server:
+        http = configure(requests.Session(), pool_size=8)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(
+                pool.map(lambda _: http.get(server.url + "/patrons"), range(40))
+            )
+        http.close()
+    assert all(len(r.json()) == 50 for r in responses)
+    assert all(r.headers["Content-Encoding"] == "gzip" for r in responses)
+    assert server.connections <= 8
+
+
+def test_default_timeout(monkeypatch):
+    sent: dict = {}
+    # stop before the network, we only want the kwargs send was given
+    monkeypatch.setattr(
+        HTTPAdapter, "send", lambda self, request, **kwargs: sent.update(kwargs)
+    )
+    adapter = PooledAdapter(timeout=(1.0, 2.0))
+    adapter.send(requests.Request("GET", "http://koha").prepare())
+    assert sent["timeout"] == (1.0, 2.0)
+    adapter.send(requests.Request("GET", "http://koha").prepare(), timeout=5)
+    assert sent["timeout"] == 5
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1", True),
+        ("true", True),
+        ("Yes", True),
+        ("0", False),
+        ("false", False),
+        ("", False),
+    ],
+)
+def test_ssl_verify(monkeypatch, value, expected):
+    monkeypatch.setenv("SSL_VERIFY", value)
+    assert ssl_verify(default=not expected) is expected
+
+
+def test_ssl_verify_default(monkeypatch):
+    monkeypatch.delenv("SSL_VERIFY", raising=False)
+    assert ssl_verify(default=True) is True
+    assert ssl_verify(default=False) is False
+
+
+def test_parse_timeout():
+    assert parse_timeout("10,120") == (10.0, 120.0)
+    assert parse_timeout("30") == (30.0, 30.0)
@@ -0,0 +1,70 @@
+"""HTTP transport settings for Koha sessions: a connection pool sized to the
+number of concurrent requests so every worker reuses a keep-alive connection,
+compressed responses, and default timeouts. KOHA_POOL_SIZE and KOHA_TIMEOUT
+("connect,read" seconds, or one number for both) override the defaults,
+SSL_VERIFY turns certificate verification on or off."""
+
+from __future__ import annotations
+
+import os
+
+from requests import PreparedRequest, Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+
+def parse_timeout(value: str) -> tuple[float, float]:
+    """Timeouts from KOHA_TIMEOUT's "connect,read" seconds, or one number
+    used for both"""
+    seconds: list[float] = [float(t) for t in value.split(",")]
+    if len(seconds) == 1:
+        return seconds[0], seconds[0]
+    connect, read = seconds
+    return connect, read
+
+
+# patron_update.py's default --concurrency
+POOL_SIZE: int = int(os.environ.get("KOHA_POOL_SIZE", "16"))
+# seconds to connect & to wait for a response, large /patrons pages are slow
+TIMEOUT: tuple[float, float] = parse_timeout(os.environ.get("KOHA_TIMEOUT", "10,120"))
+
+
+def ssl_verify(default: bool) -> bool:
+    """Whether to verify SSL certificates: SSL_VERIFY=1/true/yes turns it on,
+    any other value turns it off, unset uses default"""
+    value: str | None = os.environ.get("SSL_VERIFY")
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes"}
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout, requests has no session timeout"""
+
+    def __init__(
+        self, pool_size: int = POOL_SIZE, timeout: tuple[float, float] = TIMEOUT
+    ):
+        self.timeout: tuple[float, float] = timeout
+        # we talk to one or two hosts (Koha & its OAuth endpoint are the same)
+        super().__init__(pool_connections=2, pool_maxsize=pool_size)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def configure(
+    session: Session,
+    pool_size: int | None = None,
+    timeout: tuple[float, float] | None = None,
+) -> Session:
+    """Mount a pooled adapter on session & ask for compressed responses"""
+    adapter = PooledAdapter(pool_size or POOL_SIZE, timeout or TIMEOUT)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # gzip (& brotli or zstd when their packages are installed), a /patrons
+    # page of JSON compresses to a fraction of its size
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    session.headers["Connection"] = "keep-alive"
+    return session
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+"""Look up one person across the Workday files, the prox report, and the
+missing-patron files patron_update.py writes, e.g. to debug why a patron
+wasn't updated. The files are loaded into an indexed SQLite database which is
+rebuilt whenever one of them changes, so repeat lookups are instant."""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import click
+
+if TYPE_CHECKING:
+    from workday.models import Person
+
+# clean.py deletes the index, it holds personal information
+INDEX: str = ".lookup_index.sqlite"
+
+SCHEMA: str = """
+CREATE TABLE sources (path TEXT PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE people (
+    type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    username TEXT,
+    universal_id TEXT,
+    student_id TEXT,
+    email TEXT,
+    record TEXT NOT NULL
+);
+CREATE TABLE prox (universal_id TEXT PRIMARY KEY, prox TEXT NOT NULL);
+CREATE TABLE missing (source TEXT NOT NULL, username TEXT, universal_id TEXT);
+CREATE INDEX people_username ON people (username);
+CREATE INDEX people_universal_id ON people (universal_id);
+CREATE INDEX people_student_id ON people (student_id);
+CREATE INDEX people_email ON people (email);
+CREATE INDEX prox_prox ON prox (prox);
+CREATE INDEX missing_username ON missing (username);
+CREATE INDEX missing_universal_id ON missing (universal_id);
+"""
+
+
+def sources(workday: tuple[str, ...], prox: str | None, missing: tuple[str, ...]):
+    """{ path: kind } of the files to index that exist"""
+    files: dict[str, str] = {path: "workday" for path in workday}
+    if prox:
+        files[prox] = "prox"
+    files.update({path: "missing" for path in missing})
+    return {path: kind for path, kind in files.items() if os.path.exists(path)}
+
+
+def email(person: Person) -> str | None:
+    address: str | None = getattr(person, "inst_email", None) or getattr(
+        person, "work_email", None
+    )
+    return address.lower() if address else None
+
+
+def is_current(db: sqlite3.Connection, files: dict[str, str]) -> bool:
+    from workday.cache import file_hash
+
+    try:
+        indexed: dict[str, str] = dict(db.execute("SELECT path, hash FROM sources"))
+    except sqlite3.DatabaseError:
+        return False
+    return indexed == {path: file_hash(path) for path in files}
+
+
+def build(index: str | Path, files: dict[str, str], use_cache: bool = True) -> None:
+    """Index the files into a new database that replaces the old one
+    atomically, so a failed build never leaves a partial index"""
+    from compressed import open_text
+    from prox import create_prox_map
+    from workday.cache import file_hash, load_people
+
+    partial: str = f"{index}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    db = sqlite3.connect(partial)
+    db.executescript(SCHEMA)
+    for path, kind in files.items():
+        db.execute("INSERT INTO sources VALUES (?, ?)", (path, file_hash(path)))
+        if kind == "workday":
+            db.executemany(
+                "INSERT INTO people VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        type(person).__name__,
+                        path,
+                        person.username.lower(),
+                        person.universal_id,
+                        getattr(person, "student_id", None),
+                        email(person),
+                        person.model_dump_json(),
+                    )
+                    for person in load_people(path, use_cache)
+                ),
+            )
+        elif kind == "prox":
+            db.executemany(
+                "INSERT INTO prox VALUES (?, ?)", create_prox_map(path).items()
+            )
+        else:
+            with open_text(path) as file:
+                db.executemany(
+                    "INSERT INTO missing VALUES (?, ?, ?)",
+                    (
+                        (
+                            path,
+                            str(person.get("username", "")).lower(),
+                            person.get("universal_id"),
+                        )
+                        for person in json.load(file)
+                    ),
+                )
+    db.commit()
+    db.close()
+    os.replace(partial, index)
+
+
+def find(db: sqlite3.Connection, query: str) -> list[sqlite3.Row]:
+    """People whose username, universal ID, student ID, email, or prox number
+    is query"""
+    q: str = query.strip().lower()
+    return db.execute(
+        """SELECT * FROM people
+        WHERE username = :q OR universal_id = :uid OR student_id = :q
+            OR email = :q
+            OR universal_id IN (SELECT universal_id FROM prox WHERE prox = :q)""",
+        # prox report IDs have leading zeroes stripped, see create_prox_map
+        {"q": q, "uid": q.lstrip("0")},
+    ).fetchall()
+
+
+def koha_row(person: Person, prox_map: dict[str, str], end_date: str):
+    """The bulk import row create_koha_csv.py would make & its warnings"""
+    import create_koha_csv
+    from workday.models import Student
+
+    # collect this person's warnings separately from the script's report
+    warnings = create_koha_csv.WarningReport()
+    if isinstance(person, Student):
+        row = create_koha_csv.make_student_row(person, prox_map, end_date, warnings)
+    else:
+        row = create_koha_csv.make_employee_row(person, prox_map, end_date, warnings)
+    return row, warnings
+
+
+def describe(db: sqlite3.Connection, match: sqlite3.Row, end_date: str) -> str:
+    from patron_update import is_synced
+    from workday.models import Employee, Student
+
+    model = Student if match["type"] == "Student" else Employee
+    person: Person = model.model_validate_json(match["record"])
+    prox: tuple[str] | None = db.execute(
+        "SELECT prox FROM prox WHERE universal_id = ?", (person.universal_id,)
+    ).fetchone()
+    missing: list[str] = [
+        source
+        for (source,) in db.execute(
+            "SELECT source FROM missing WHERE username = ? OR universal_id = ?",
+            (match["username"], person.universal_id),
+        )
+    ]
+    row, warnings = koha_row(
+        person, {person.universal_id: prox[0]} if prox else {}, end_date
+    )
+
+    lines: list[str] = [
+        f"=== {match['type']} {person.username} in {match['source']} ===",
+        json.dumps(json.loads(match["record"]), indent=2),
+        f"- Prox number: {prox[0] if prox else 'not in the prox report'}",
+        f"- Synced by patron_update.py: {'yes' if is_synced(person) else 'no'}",
+        f"- In missing-patron files: {', '.join(missing) or 'no'}",
+    ]
+    if row:
+        lines.append(f"- Category: {row['categorycode']}")
+        lines.append(f"- Cardnumber: {row['cardnumber']}")
+        lines.append(f"- Expires: {row['dateexpiry']}")
+        lines.append(f"- Attributes (major/department): {row['patron_attributes']}")
+    else:
+        lines.append("- create_koha_csv.py skips this person")
+    if len(warnings):
+        lines.append(warnings.render())
+    return "\n".join(lines)
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.argument("queries", nargs=-1, required=True)
+@click.option(
+    "-w",
+    "--workday",
+    default=("employee_data.json", "student_data.json"),
+    show_default=True,
+    help="Workday JSON file, can be repeated",
+    multiple=True,
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "-p",
+    "--prox",
+    default="data/prox.csv",
+    show_default=True,
+    help="Prox CSV file",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "-m",
+    "--missing",
+    default=lambda: tuple(sorted(glob.glob("*-missing-*.json"))),
+    help="Missing-patron JSON file, can be repeated (default: *-missing-*.json)",
+    multiple=True,
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--end",
+    "end_date",
+    default=lambda: date.today().isoformat(),
+    help="Semester end date used to compute expiration dates (default: today)",
+)
+@click.option(
+    "--index",
+    default=INDEX,
+    show_default=True,
+    help="SQLite index file",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--rebuild",
+    help="Rebuild the index even if the files haven't changed",
+    is_flag=True,
+)
+@click.option(
+    "--no-cache",
+    help="Re-parse Workday files instead of using cached validated records",
+    is_flag=True,
+)
+def main(
+    queries: tuple[str, ...],
+    workday: tuple[str, ...],
+    prox: str,
+    missing: tuple[str, ...],
+    end_date: str,
+    index: str,
+    rebuild: bool,
+    no_cache: bool,
+):
+    """Show the Workday record, prox number, and Koha mapping of the people
+    matching each QUERY, a username, universal ID, student ID, email, or prox
+    number."""
+    from termcolor import colored
+
+    files: dict[str, str] = sources(workday, prox, missing)
+    if not files and not os.path.exists(index):
+        raise click.UsageError("None of the files to index exist.")
+    db = sqlite3.connect(index)
+    # with none of the files around (e.g. after clean.py), use the last index
+    if rebuild or (files and not is_current(db, files)):
+        db.close()
+        print(f"Indexing {', '.join(files)}")
+        build(index, files, use_cache=not no_cache)
+        db = sqlite3.connect(index)
+    db.row_factory = sqlite3.Row
+
+    for query in queries:
+        matches: list[sqlite3.Row] = find(db, query)
+        if not matches:
+            print(colored(f"No one matches {query}", "yellow"))
+        for match in matches:
+            print(describe(db, match, end_date) + "\n")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
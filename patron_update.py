@@ -1,90 +1,87 @@
 #!/usr/bin/env python
-import csv
+# network, validation, and colour libraries are imported inside the functions
+# that use them so `--help` and imports from other scripts stay fast
+from __future__ import annotations
+
 import json
-import subprocess
+import sys
+import threading
+import unicodedata
+import zlib
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
+from functools import cache
+from itertools import repeat
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import click
-from requests import Response
-from requests.exceptions import HTTPError
-from termcolor import colored
 
-from koha_patron.config import config
-from koha_patron.patron import PATRON_READ_ONLY_FIELDS
-from koha_patron.request_wrapper import request_wrapper
-from workday.models import Employee, Person, Student
-from workday.utils import get_entries
+from fingerprint import fingerprint
+from prox import create_prox_map
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+    from koha_patron.concurrency import AdaptiveLimiter
+    from workday.models import Employee, Person
 
 
 def check_cca_dns() -> bool:
     """GlobalProect VPN adds 2 cca.edu DNS resolvers"""
+    import subprocess
+
     result = subprocess.run(["scutil", "--dns"], capture_output=True, text=True)
     return "cca.edu" in result.stdout
 
 
-# Universal IDs of patrons who should not have their prox numbers updated
-# e.g. because the prox report seems to have the wrong number for them
-PROX_EXCEPTIONS: list[str] = ["1458769"]
-NAME_EXCEPTIONS: list[str] = []  # not needed yet
+def confirm_network() -> None:
+    """Koha blocks external API requests, so ask before going on without the
+    VPN & exit if the answer is no"""
+    if not check_cca_dns() and not click.confirm(
+        "You don't appear to be on the CCA network or VPN. Continue?"
+    ):
+        sys.exit()
 
 
-def create_prox_map(prox_file: str | Path) -> dict[str, str]:
-    """Create a dict of { CCA ID : prox number } so we can look up patrons'
-    card numbers by their ID. Prox report does not have other identifiers like
-    username or email so we use CCA (universal, not student) ID.
+def koha_session(pool_size: int | None = None) -> Session:
+    """An authenticated Koha session, see request_wrapper"""
+    from koha_patron.request_wrapper import request_wrapper
 
-    Args:
-        prox_file (str|Path): path to the prox report CSV
+    http: Session | None = request_wrapper(pool_size=pool_size)
+    if http is None:
+        raise click.ClickException("Failed to create HTTP session")
+    return http
 
-    Raises:
-        RuntimeError: if the CSV is not in the expected format
 
-    Returns:
-        dict: map of CCA IDs to prox numbers
-    """
-    with open(prox_file, mode="r") as file:
-        # check the first line, which we'll always skip, to ensure CSV format
-        first_line: str = file.readline()
-        if "Active Accounts with Prox IDs" in first_line:
-            # skip the first 3 lines ("List of", empty line, then header row)
-            file.readline()
-            file.readline()
-        elif (
-            '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"'
-            in first_line
-        ):
-            # we already skipped the header row
-            pass
-        else:
-            raise RuntimeError(
-                f'The CSV of prox numbers "{prox_file}" was in an unexpected format. It should be a CSV export from OneCard either unmodified or with the two preamble rows removed but the header row present. Double-check the format of the file.'
-            )
-        # read rows from the rest of the CSV
-        reader = csv.reader(file)
-        # Universal ID => prox number mapping
-        # Prox report Univ IDs have varying number of leading zeroes e.g.
-        # "001000001", "010000001", so we strip them
-        map: dict[str, str] = {}
-        for row in reader:
-            # normalize IDs to be last 5 digits
-            prox = row[2].rstrip()[4:]
-            if prox != "" and int(prox) != 0:
-                map[row[0].lstrip("0")] = prox
-        return map
+# fingerprints of each patron's cardnumber & name in Koha as of the last sync,
+# keyed hashes that can't be matched to people without the fingerprint key.
+# They let the next sync check the patrons who likely changed first.
+KOHA_STATE_FILE: str = ".koha_state.json"
+# order of a sync's work, updates go ahead of checks of the same priority
+CARD, NAME, VERIFY = 0, 1, 2
+UPDATE, CHECK = 0, 1
+
+# Universal IDs of patrons who should not have their prox numbers updated
+# e.g. because the prox report seems to have the wrong number for them
+PROX_EXCEPTIONS: list[str] = ["1458769"]
+NAME_EXCEPTIONS: list[str] = []  # not needed yet
 
 
 def handle_http_error(response: Response, workday: Person, prox: str | None) -> None:
+    from requests.exceptions import HTTPError
+    from termcolor import colored
+
     try:
         response.raise_for_status()
     except HTTPError:
         """log info about HTTP error"""
-        results["totals"]["error"] += 1
-        print(colored("Error", "red"), response)
-        print("HTTP Response Headers", response.headers)
-        print(response.text)
-        print(
+        tally(workday, "error")
+        log(colored("Error", "red"), response)
+        log("HTTP Response Headers", response.headers)
+        log(response.text)
+        log(
             colored(
                 f"""Error for patron {workday.username} """
                 f"""({workday.first_name} {workday.last_name}) with prox """
@@ -94,20 +91,102 @@ def handle_http_error(response: Response, workday: Person, prox: str | None) ->
         )
 
 
-def missing_patron(workday: dict) -> None:
-    print(f"Could not find a patron with a userid of {workday['username']} in Koha.")
-    results["totals"]["missing"] += 1
-    results["missing"].append(workday)
+def missing_patron(workday: Person) -> None:
+    log(f"Could not find a patron with a userid of {workday.username} in Koha.")
+    tally(workday, "missing")
+    with results_lock:
+        results[type(workday).__name__]["missing"].append(
+            workday.model_dump(mode="json")
+        )
 
 
-def has_changed(koha: dict, workday: Person, prox: str | None) -> bool:
+@cache
+def normalize_name(name: str | None) -> str:
+    # Koha and Workday may store the same name in different Unicode forms
+    # (e.g. "é" as one or two code points) or with stray whitespace
+    return " ".join(unicodedata.normalize("NFC", name or "").split())
+
+
+@cache
+def normalize_cardnumber(cardnumber: str | int | None) -> str:
+    # leading zeroes are significant, scanned cards must match exactly
+    return str(cardnumber or "").strip()
+
+
+def name_changed(koha: dict, workday: Person) -> bool:
+    if workday.universal_id in NAME_EXCEPTIONS:
+        return False
+    first: str = normalize_name(workday.first_name)
+    # staff may have set the Workday first name as the preferred name only
     return (
+        first != normalize_name(koha["firstname"])
+        and first != normalize_name(koha.get("preferred_name"))
+    ) or normalize_name(workday.last_name) != normalize_name(koha["surname"])
+
+
+def card_changed(koha: dict, workday: Person, prox: str | None) -> bool:
+    return bool(
+        prox
+        and workday.universal_id not in PROX_EXCEPTIONS
+        and normalize_cardnumber(prox) != normalize_cardnumber(koha["cardnumber"])
+    )
+
+
+def has_changed(koha: dict, workday: Person, prox: str | None) -> bool:
+    return name_changed(koha, workday) or card_changed(koha, workday, prox)
+
+
+def differs(koha: dict, workday: Person, prox: str | None) -> bool:
+    """Whether a raw comparison, without normalization or exceptions, would
+    have sent an update. Used to count the writes has_changed avoids."""
+    return bool(
         (prox and koha["cardnumber"] != prox)
         or koha["firstname"] != workday.first_name
         or koha["surname"] != workday.last_name
     )
 
 
+def name_fingerprint(workday: Person) -> str:
+    return fingerprint(
+        f"{normalize_name(workday.first_name)}\0{normalize_name(workday.last_name)}"
+    )
+
+
+def priority(
+    workday: Person, prox: str | None, known: dict[str, dict[str, str]]
+) -> int:
+    """Whether the patron's cardnumber or name likely changed since the last
+    sync, going by the prox map & the Koha state we remember, or only needs
+    verifying. Without a fingerprint anyone with a prox number may need a
+    card change."""
+    seen: dict[str, str] | None = known.get(fingerprint(workday.universal_id))
+    if (
+        prox
+        and workday.universal_id not in PROX_EXCEPTIONS
+        and (seen is None or seen["card"] != fingerprint(normalize_cardnumber(prox)))
+    ):
+        return CARD
+    if workday.universal_id not in NAME_EXCEPTIONS and (
+        seen is None or seen["name"] != name_fingerprint(workday)
+    ):
+        return NAME
+    return VERIFY
+
+
+def load_known(path: Path) -> dict[str, dict[str, str]]:
+    if path.exists():
+        with open(path) as file:
+            return json.load(file)
+    return {}
+
+
+def save_known(path: Path, known: dict[str, dict[str, str]]) -> None:
+    partial: Path = path.with_suffix(".partial")
+    with open(partial, "w") as file:
+        json.dump(known, file)
+    partial.replace(path)
+
+
 def skipped_employee(wd: Employee) -> bool:
     return (
         wd.etype == "Contingent Employees/Contractors"
@@ -117,19 +196,22 @@ def skipped_employee(wd: Employee) -> bool:
     )
 
 
-def check_patron(workday: Person, prox: str | None, dry_run: bool):
+def check_patron(workday: Person, prox: str | None):
     """Try to find Koha account given WD profile.
-    If cardnumber or name have changed,
-    pass the new prox num to update_patron(koha, wd, prox).
+    If cardnumber or name have changed, pass the Koha record & new prox num
+    to on_change, which queues an update or holds it for the bulk export.
 
     Args:
         workday (dict): Workday object of personal info
         prox (int): card number
     """
+    from koha_patron.config import config
+
     if not http:
         raise Exception("Failed to create HTTP session")
-    response: Response = http.get(
-        f"{config['api_root']}/patrons?userid={workday.username}&_match=exact"
+    response: Response = limiter.call(
+        http.get,
+        f"{config['api_root']}/patrons?userid={workday.username}&_match=exact",
     )
     handle_http_error(response, workday, prox)
     patrons: list | dict = response.json()
@@ -137,12 +219,15 @@ def check_patron(workday: Person, prox: str | None, dry_run: bool):
     # patrons is a dict if we had an error above, list otherwise
     if isinstance(patrons, list):
         if len(patrons) == 0:
-            missing_patron(workday.model_dump(mode="json"))
+            missing_patron(workday)
         elif len(patrons) == 1:
             if has_changed(patrons[0], workday, prox):
-                update_patron(patrons[0], workday, prox, dry_run)
+                on_change(patrons[0], workday, prox)
             else:
-                results["totals"]["unchanged"] += 1
+                tally(workday, "unchanged")
+                remember(workday, prox or patrons[0]["cardnumber"])
+                if differs(patrons[0], workday, prox):
+                    tally(workday, "avoided")
         else:
             # theoretically impossible with _match=exact
             raise RuntimeError(
@@ -150,39 +235,41 @@ def check_patron(workday: Person, prox: str | None, dry_run: bool):
             )
 
 
-def update_patron(koha: dict, workday: Person, prox: str | None, dry_run: bool) -> None:
-    print(f"Updating patron {koha['userid']}", end=" ")
+def apply_changes(koha: dict, workday: Person, prox: str | None) -> str:
+    """Change the Koha record in place, returns a description of the changes"""
+    # build the whole status line before printing it so lines from different
+    # Workday files running concurrently don't interleave
+    message: list[str] = [f"Updating patron {koha['userid']}"]
 
     # name change
-    if (
-        koha["firstname"] != workday.first_name
-        or koha["surname"] != workday.last_name
-        and workday.universal_id not in NAME_EXCEPTIONS
-    ):
-        print(
-            f"{koha['firstname']} {koha['surname']} => {workday.first_name} {workday.last_name}",
-            end=" ",
+    if name_changed(koha, workday):
+        message.append(
+            f"{koha['firstname']} {koha['surname']} => {workday.first_name} {workday.last_name}"
         )
-        koha["firstname"] = workday.first_name
-        koha["preferred_name"] = workday.first_name
-        koha["surname"] = workday.last_name
-        results["totals"]["name change"] += 1
+        koha["firstname"] = normalize_name(workday.first_name)
+        koha["preferred_name"] = normalize_name(workday.first_name)
+        koha["surname"] = normalize_name(workday.last_name)
+        tally(workday, "name change")
     else:
-        print(f"{koha['firstname']} {koha['surname']}", end=" ")
+        message.append(f"{koha['firstname']} {koha['surname']}")
 
     # new prox number
-    if (
-        prox
-        and koha["cardnumber"] != prox
-        and workday.universal_id not in PROX_EXCEPTIONS
-    ):
-        print(f"Cardnumber {koha['cardnumber']} => {prox}")
+    if card_changed(koha, workday, prox):
+        message.append(f"Cardnumber {koha['cardnumber']} => {prox}")
         # backup old cardnumber in "sort2" field
         koha["statistics_2"] = koha["cardnumber"]
         koha["cardnumber"] = prox
-        results["totals"]["prox change"] += 1
+        tally(workday, "prox change")
     else:
-        print("Cardnumber", koha["cardnumber"])
+        message.append(f"Cardnumber {koha['cardnumber']}")
+    return " ".join(message)
+
+
+def update_patron(koha: dict, workday: Person, prox: str | None, dry_run: bool) -> None:
+    from koha_patron.config import config
+    from koha_patron.patron import PATRON_READ_ONLY_FIELDS
+
+    log(apply_changes(koha, workday, prox))
 
     # must do this or PUT request fails b/c we can't edit these fields
     for field in PATRON_READ_ONLY_FIELDS:
@@ -191,7 +278,8 @@ def update_patron(koha: dict, workday: Person, prox: str | None, dry_run: bool)
     if not dry_run:
         if http is None:
             raise Exception("Failed to create HTTP session")
-        response: Response = http.put(
+        response: Response = limiter.call(
+            http.put,
             "{}/patrons/{}".format(
                 config["api_root"],
                 koha["patron_id"],
@@ -199,8 +287,10 @@ def update_patron(koha: dict, workday: Person, prox: str | None, dry_run: bool)
             json=koha,
         )
         handle_http_error(response, workday, prox)
+        if response.ok:
+            remember(workday, koha["cardnumber"])
 
-    results["totals"]["updated"] += 1
+    tally(workday, "updated")
 
 
 def mk_missing_file(missing: list[Person], ptype: str) -> None:
@@ -209,53 +299,401 @@ def mk_missing_file(missing: list[Person], ptype: str) -> None:
     Args:
         missing (list): list of workday people objects
     """
-    filename: str = f"{date.today().isoformat()}-missing-{ptype.lower()}s.json"
+    filename: str = dated(f"missing-{ptype.lower()}s.json")
     with open(filename, "w") as file:
         json.dump(missing, file, indent=2)
         print(f"\nWrote {len(missing)} missing patrons to {filename}")
 
 
-def load_data(filename: Path) -> list[Person]:
-    people_dicts: list[dict] = []
-    with open(filename, "r") as file:
-        people_dicts: list[dict] = get_entries(json.load(file))
+def load_data(filename: Path, use_cache: bool = True) -> list[Person]:
+    from workday.cache import load_people
 
-        if people_dicts[0].get("employee_id"):
-            return [Employee(**p) for p in people_dicts]
-        elif people_dicts[0].get("student_id"):
-            return [Student(**p) for p in people_dicts]
-        else:
-            raise RuntimeError(
-                f"Could not determine the type of person from the first entry in the JSON file {filename}."
-            )
+    return load_people(filename, use_cache)
 
 
-def summary(totals: dict[str, int]) -> None:
+def summary(totals: dict[str, int], title: str = "Summary") -> None:
     # Print summary of changes
+    total: int = (
+        totals["unchanged"]
+        + totals["updated"]
+        + totals["exported"]
+        + totals["missing"]
+        + totals["deferred"]
+    )
     print(
         f"""
-=== Summary ===
-- Total patrons: {totals["unchanged"] + totals["updated"] + totals["missing"]}
+=== {title} ===
+- Total patrons: {total}
 - Errors: {totals["error"]}
 - Missing from Koha: {totals["missing"]}
 - Updated: {totals["updated"]}
+- Exported for bulk update: {totals["exported"]}
+- Not checked before --budget ran out: {totals["deferred"]}
+- Writes avoided by name & cardnumber normalization: {totals["avoided"]}
 - Name changes: {totals["name change"]}
 - Cardnumber changes: {totals["prox change"]}"""
     )
 
 
-# global var that other functions access
-results: dict[str, Any] = {
-    "missing": [],
-    "totals": {
-        "missing": 0,
-        "error": 0,
-        "updated": 0,
-        "unchanged": 0,
-        "name change": 0,
-        "prox change": 0,
-    },
-}
+def new_results() -> dict[str, Any]:
+    return {
+        "missing": [],
+        # (Koha record, Workday person, prox) of patrons that need updates
+        "pending": [],
+        # fingerprints of patrons whose Koha record matches Workday, by
+        # fingerprint of their universal ID
+        "seen": {},
+        "totals": {
+            "missing": 0,
+            "error": 0,
+            "updated": 0,
+            "exported": 0,
+            "avoided": 0,
+            "unchanged": 0,
+            "deferred": 0,
+            "name change": 0,
+            "prox change": 0,
+        },
+    }
+
+
+def combine_totals(totals: list[dict[str, int]]) -> dict[str, int]:
+    combined: dict[str, int] = new_results()["totals"]
+    for t in totals:
+        for key, value in t.items():
+            combined[key] += value
+    return combined
+
+
+def dated(name: str) -> str:
+    """Today's output file name, including the target when syncing several"""
+    parts: list[str] = [date.today().isoformat(), target, name]
+    return "-".join(filter(None, parts))
+
+
+# global var that other functions access, keyed by person type name ("Employee"
+# or "Student") so one run can sync both Workday files
+results: dict[str, dict[str, Any]] = {}
+# patrons are checked in parallel threads which all write to results
+results_lock = threading.Lock()
+# set in run_sync: one HTTP session and concurrency limit shared by all threads
+http: Session | None = None
+limiter: AdaptiveLimiter
+# per-patron messages go through the progress display while a sync runs
+log: Callable[..., None] = print
+# set in sync_target: name of the Koha instance this process syncs when there
+# are several, it labels output so concurrent targets can be told apart
+target: str = ""
+
+
+def tally(workday: Person, key: str) -> None:
+    with results_lock:
+        results[type(workday).__name__]["totals"][key] += 1
+
+
+def remember(workday: Person, cardnumber: str) -> None:
+    """Record the cardnumber & name Koha has for a patron we synced"""
+    with results_lock:
+        results[type(workday).__name__]["seen"][fingerprint(workday.universal_id)] = {
+            "card": fingerprint(normalize_cardnumber(cardnumber)),
+            "name": name_fingerprint(workday),
+        }
+
+
+def hold(koha: dict, workday: Person, prox: str | None) -> None:
+    """Keep a change in results for the bulk export or the caller to apply"""
+    with results_lock:
+        results[type(workday).__name__]["pending"].append((koha, workday, prox))
+
+
+# what check_patron does with a change, run_sync swaps in one that queues an
+# update while the sync runs
+on_change: Callable[[dict, Person, str | None], None] = hold
+
+
+def is_synced(person: Person) -> bool:
+    from workday.models import Employee, Student
+
+    # skip temp/contractor positions
+    if isinstance(person, Employee) and skipped_employee(person):
+        return False
+    # skip incomplete students (username = id when they haven't chosen one yet)
+    if isinstance(person, Student) and not person.inst_email:
+        return False
+    return True
+
+
+def run_sync(
+    populations: dict[str, list[Person]],
+    prox_map: dict[str, str],
+    concurrency: int,
+    live: bool | None = None,
+    label: str = "",
+    dry_run: bool = False,
+    known: dict[str, dict[str, str]] | None = None,
+    api_limit: int | None = None,
+    budget: float | None = None,
+) -> tuple[dict[str, dict[str, Any]], str]:
+    """Check people over one Koha session, likely card changes first, then
+    likely name changes, then everyone else. Changes are PUT as soon as
+    they're found, ahead of remaining checks, until api_limit updates are
+    queued; later ones are held in results for the bulk export. Checks not
+    started within budget seconds are skipped. Returns results & a limiter
+    report. Runs in a separate process for each shard when --workers > 1."""
+    global http, limiter, log, on_change
+    from koha_patron.concurrency import AdaptiveLimiter, WorkQueue
+    from koha_patron.request_wrapper import request_wrapper
+    from progress import Progress
+
+    http = request_wrapper(pool_size=concurrency)
+    limiter = AdaptiveLimiter(initial=min(4, concurrency), maximum=concurrency)
+    # a pool process can run several shards, each returns only its own results
+    results.clear()
+    for ptype in populations:
+        results[ptype] = new_results()
+
+    people: list[Person] = [
+        person for pop in populations.values() for person in pop if is_synced(person)
+    ]
+    progress = Progress(
+        len(people),
+        requests=lambda: (limiter.requests, limiter.errors),
+        live=live,
+        label=label,
+    )
+    log = progress.log
+
+    # the limiter decides how many of the workers may have a request in flight
+    queue = WorkQueue(workers=concurrency, budget=budget)
+    queued_updates: int = 0
+    queue_lock = threading.Lock()
+
+    def queue_update(koha: dict, workday: Person, prox: str | None) -> None:
+        nonlocal queued_updates
+        with queue_lock:
+            over_limit: bool = api_limit is not None and queued_updates >= api_limit
+            if not over_limit:
+                queued_updates += 1
+        if over_limit:
+            hold(koha, workday, prox)
+            return
+        kind: int = CARD if card_changed(koha, workday, prox) else NAME
+        queue.put((kind, UPDATE), lambda: update_patron(koha, workday, prox, dry_run))
+
+    def check(person: Person, prox: str | None) -> None:
+        check_patron(person, prox)
+        progress.advance()
+
+    def defer(person: Person) -> None:
+        tally(person, "deferred")
+        progress.advance()
+
+    on_change = queue_update
+    for person in people:
+        prox: str | None = prox_map.get(person.universal_id)
+        queue.put(
+            (priority(person, prox, known or {}), CHECK),
+            lambda person=person, prox=prox: check(person, prox),
+            lambda person=person: defer(person),
+        )
+    try:
+        queue.run()
+    finally:
+        on_change = hold
+        progress.finish()
+    log = print
+    return results, limiter.report()
+
+
+def shard_populations(
+    populations: dict[str, list[Person]], workers: int
+) -> list[dict[str, list[Person]]]:
+    # crc32 rather than hash() which is randomized per process
+    shards: list[dict[str, list[Person]]] = [{} for _ in range(workers)]
+    for ptype, people in populations.items():
+        for person in people:
+            shard: int = zlib.crc32(person.universal_id.encode()) % workers
+            shards[shard].setdefault(ptype, []).append(person)
+    return shards
+
+
+def merge_results(shard_results: dict[str, dict[str, Any]]) -> None:
+    for ptype, result in shard_results.items():
+        merged: dict[str, Any] = results.setdefault(ptype, new_results())
+        merged["missing"].extend(result["missing"])
+        merged["pending"].extend(result["pending"])
+        merged["seen"].update(result["seen"])
+        merged["totals"] = combine_totals([merged["totals"], result["totals"]])
+
+
+def sync(
+    populations: dict[str, list[Person]],
+    prox_map: dict[str, str],
+    dry_run: bool,
+    concurrency: int,
+    workers: int = 1,
+    bulk_threshold: int = 1000,
+    budget: float | None = None,
+) -> dict[str, int]:
+    """Check & update people, write missing files, print summaries. Returns
+    the combined totals. Used by main and scheduler.py."""
+    global http
+    from termcolor import colored
+
+    # start afresh when a long-running process syncs more than once
+    http = None
+    results.clear()
+
+    known_file = Path(f".koha_state-{target}.json" if target else KOHA_STATE_FILE)
+    known: dict[str, dict[str, str]] = load_known(known_file)
+    # each shard may update its share of --bulk-threshold patrons via the API
+    api_limit: int | None = -(-bulk_threshold // workers) if bulk_threshold else None
+    reports: list[str] = []
+    if workers > 1:
+        shards: list[dict[str, list[Person]]] = shard_populations(populations, workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # shards share the terminal so they print plain status lines
+            for shard_results, report in pool.map(
+                run_sync,
+                shards,
+                repeat(prox_map),
+                repeat(concurrency),
+                repeat(False),
+                [f"[shard {i + 1}/{workers}] " for i in range(workers)],
+                repeat(dry_run),
+                repeat(known),
+                repeat(api_limit),
+                repeat(budget),
+            ):
+                merge_results(shard_results)
+                reports.append(report)
+    else:
+        _, report = run_sync(
+            populations,
+            prox_map,
+            concurrency,
+            False if target else None,
+            f"[{target}] " if target else "",
+            dry_run,
+            known,
+            api_limit,
+            budget,
+        )
+        reports.append(report)
+
+    # changes beyond the API limit
+    pending: list[tuple[dict, Person, str | None]] = [
+        change for result in results.values() for change in result["pending"]
+    ]
+    if pending:
+        from bulk_update import write_export
+
+        for koha, person, card in pending:
+            apply_changes(koha, person, card)
+            tally(person, "exported")
+        if dry_run:
+            # no patron data files from a dry run
+            print(
+                colored(
+                    f"\nMore than --bulk-threshold {bulk_threshold} patrons need "
+                    f"updates, {len(pending)} would be exported for Koha's Import "
+                    "Patrons tool. Dry run: no file written.",
+                    "yellow",
+                )
+            )
+        else:
+            filename: str = write_export(
+                [koha for koha, _, _ in pending], dated("patron-bulk-update.csv")
+            )
+            print(
+                colored(
+                    f"\nMore than --bulk-threshold {bulk_threshold} patrons need "
+                    f"updates. The most urgent were updated via the API, the other "
+                    f"{len(pending)} are in {filename} for Koha's Import Patrons "
+                    f"tool. Then run ./bulk_update.py {filename} to spot-check the "
+                    "import.",
+                    "yellow",
+                )
+            )
+    if not dry_run:
+        for result in results.values():
+            known.update(result["seen"])
+        save_known(known_file, known)
+
+    for ptype, result in results.items():
+        if len(result["missing"]) > 0:
+            mk_missing_file(result["missing"], ptype)
+
+    title: str = f"{target} Summary" if target else "Summary"
+    if len(results) > 1:
+        for ptype, result in results.items():
+            summary(result["totals"], f"{target} {ptype} Summary".lstrip())
+    totals: dict[str, int] = combine_totals([r["totals"] for r in results.values()])
+    summary(totals, title)
+    for report in reports:
+        print(f"[{target}] {report}" if target else report)
+    return totals
+
+
+def sync_target(
+    name: str,
+    settings: dict[str, str],
+    populations: dict[str, list[Person]],
+    prox_map: dict[str, str],
+    dry_run: bool,
+    concurrency: int,
+    bulk_threshold: int,
+    budget: float | None = None,
+) -> dict[str, int]:
+    """sync() against one Koha instance, runs in its own process because the
+    session, limiter, results & config are all per process"""
+    global target
+    from koha_patron.targets import use
+
+    use(settings)
+    target = name
+    return sync(populations, prox_map, dry_run, concurrency, 1, bulk_threshold, budget)
+
+
+def sync_targets(
+    names: tuple[str, ...],
+    populations: dict[str, list[Person]],
+    prox_map: dict[str, str],
+    dry_run: bool,
+    concurrency: int,
+    bulk_threshold: int,
+    budget: float | None = None,
+) -> dict[str, dict[str, int]]:
+    """Sync the Workday data, parsed once, to several Koha instances at once.
+    Each gets its own session, concurrency limit, output files & summary.
+    Returns the totals for each target."""
+    from koha_patron.targets import settings
+
+    targets: dict[str, dict[str, str]] = settings(names)
+    with ProcessPoolExecutor(max_workers=len(targets)) as pool:
+        all_totals: dict[str, dict[str, int]] = dict(
+            zip(
+                targets,
+                pool.map(
+                    sync_target,
+                    targets,
+                    targets.values(),
+                    repeat(populations),
+                    repeat(prox_map),
+                    repeat(dry_run),
+                    repeat(concurrency),
+                    repeat(bulk_threshold),
+                    repeat(budget),
+                ),
+            )
+        )
+    print("\n=== Targets ===")
+    for name, totals in all_totals.items():
+        print(
+            f"- {name}: {totals['updated']} updated, {totals['exported']} exported, "
+            f"{totals['missing']} missing, {totals['error']} errors"
+        )
+    return all_totals
 
 
 @click.command()
@@ -263,7 +701,8 @@ results: dict[str, Any] = {
 @click.option(
     "-w",
     "--workday",
-    help="Workday JSON file",
+    help="Workday JSON file, can be repeated to sync both employees and students",
+    multiple=True,
     required=True,
     type=click.Path(dir_okay=False, exists=True, readable=True),
 )
@@ -280,23 +719,78 @@ results: dict[str, Any] = {
     help="Do not update patrons, only check for changes",
     is_flag=True,
 )
-@click.option("-l", "--limit", help="Limit the number of patrons to check", type=int)
+@click.option(
+    "-l",
+    "--limit",
+    help="Limit the number of patrons to check per person type",
+    type=int,
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    default=16,
+    show_default=True,
+    help="Maximum concurrent Koha requests, the actual number adapts to Koha's latency and error rate",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--no-cache",
+    help="Re-parse Workday files instead of using cached validated records",
+    is_flag=True,
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Number of processes, each syncs a shard of people with its own Koha session",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--bulk-threshold",
+    default=1000,
+    show_default=True,
+    help="Write a CSV for Koha's patron import instead of updating more than this many patrons via the API, 0 to never export",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--budget",
+    help="Stop checking patrons after this many seconds, likely card changes are checked first, then name changes, then everyone else",
+    type=click.FloatRange(min=0),
+)
+@click.option(
+    "-t",
+    "--target",
+    help="Koha instance from the targets in koha_patron/config.py, repeat to sync several at once",
+    multiple=True,
+)
 def main(
-    workday: Path,
+    workday: tuple[Path, ...],
     dry_run: bool,
     limit: None | int,
+    concurrency: int,
+    workers: int,
+    no_cache: bool,
+    bulk_threshold: int,
+    budget: float | None,
+    target: tuple[str, ...],
     prox: Path | None = None,
 ):
-    global http, results
+    from termcolor import colored
+
+    if target:
+        from koha_patron.targets import settings
 
-    # Koha blocks external API requests, ensure we're using the VPN
-    if not check_cca_dns():
-        if not click.confirm(
-            "You don't appear to be on the CCA network or VPN. Continue?"
-        ):
-            exit()
+        if workers > 1:
+            raise click.UsageError(
+                "--workers cannot be combined with --target, each target already "
+                "syncs in its own process"
+            )
+        try:
+            settings(target)
+        except KeyError as error:
+            raise click.BadParameter(error.args[0], param_hint="--target")
 
-    http = request_wrapper()
+    confirm_network()
 
     if prox:
         prox_map: dict[str, str] = create_prox_map(prox)
@@ -309,23 +803,22 @@ def main(
     if dry_run:
         print(colored("Dry run: no changes will be made.", "yellow"))
 
-    data: list[Person] = load_data(workday)
-
-    for i, person in enumerate(data):
-        if limit and i >= limit:
-            break
-        # skip temp/contractor positions
-        if isinstance(person, Employee) and skipped_employee(person):
-            continue
-        # skip incomplete students (username = id when they haven't chosen one yet)
-        if isinstance(person, Student) and not person.inst_email:
-            continue
-        check_patron(person, prox_map.get(person.universal_id), dry_run=dry_run)
-
-    if len(results["missing"]) > 0:
-        mk_missing_file(results["missing"], type(data[0]).__name__)
-
-    summary(results["totals"])
+    # group people by type, both populations share one pool of workers
+    populations: dict[str, list[Person]] = {}
+    for file in workday:
+        data: list[Person] = load_data(file, use_cache=not no_cache)
+        populations.setdefault(type(data[0]).__name__, []).extend(data)
+    if limit:
+        populations = {ptype: people[:limit] for ptype, people in populations.items()}
+
+    if target:
+        sync_targets(
+            target, populations, prox_map, dry_run, concurrency, bulk_threshold, budget
+        )
+    else:
+        sync(
+            populations, prox_map, dry_run, concurrency, workers, bulk_threshold, budget
+        )
 
 
 if __name__ == "__main__":
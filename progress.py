@@ -0,0 +1,106 @@
+"""Progress, throughput, and ETA display for long-running syncs. On a terminal
+it redraws one status line in place; when output is piped (e.g. to `tee`) it
+prints a plain status line every so often instead. A background thread keeps
+redrawing while no items finish, so a stalled run still shows elapsed time."""
+
+import sys
+import threading
+import time
+from typing import Callable, TextIO
+
+
+def duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+class Progress:
+    def __init__(
+        self,
+        total: int,
+        requests: Callable[[], tuple[int, int]] = lambda: (0, 0),
+        stream: TextIO | None = None,
+        live: bool | None = None,
+        interval: float | None = None,
+        label: str = "",
+    ):
+        """total: number of items to process
+        requests: returns (requests made, requests that failed) so far
+        stream: where to write, sys.stdout at the time of the call by default
+        live: redraw a status line in place, defaults to whether stream is a TTY
+        interval: seconds between status updates"""
+        self.total: int = total
+        self.requests = requests
+        # looked up now, not at import, so later redirection (CliRunner,
+        # pytest's capture) is respected
+        self.stream: TextIO = stream or sys.stdout
+        self.live: bool = self.stream.isatty() if live is None else live
+        self.interval: float = interval or (0.2 if self.live else 10.0)
+        self.label: str = label
+        self.done: int = 0
+        self.start: float = time.perf_counter()
+        self._last: float = self.start
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._ticker = threading.Thread(target=self._tick, daemon=True)
+        self._ticker.start()
+
+    def status(self) -> str:
+        elapsed: float = time.perf_counter() - self.start
+        made, failed = self.requests()
+        rate: float = made / elapsed if elapsed else 0.0
+        error_rate: float = failed / made if made else 0.0
+        if self.done:
+            eta: str = duration(elapsed / self.done * (self.total - self.done))
+        else:
+            eta = "?"
+        percent: float = self.done / self.total if self.total else 1.0
+        return (
+            f"{self.label}{self.done}/{self.total} ({percent:.0%}) | "
+            f"{rate:.1f} req/s | errors {error_rate:.1%} | "
+            f"elapsed {duration(elapsed)} | ETA {eta}"
+        )
+
+    def _draw(self) -> None:
+        if self.live:
+            self.stream.write("\r\x1b[K" + self.status())
+        else:
+            self.stream.write(self.status() + "\n")
+        self.stream.flush()
+
+    def _redraw(self) -> None:
+        # caller holds the lock
+        now: float = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._draw()
+
+    def _tick(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                self._redraw()
+
+    def advance(self, *_) -> None:
+        """Mark one item done. Accepts & ignores arguments so it can be used
+        as a Future done callback."""
+        with self._lock:
+            self.done += 1
+            self._redraw()
+
+    def log(self, *args, **kwargs) -> None:
+        """print() above the live status line"""
+        with self._lock:
+            if self.live:
+                self.stream.write("\r\x1b[K")
+            print(*args, **kwargs, file=self.stream)
+            if self.live:
+                self._draw()
+
+    def finish(self) -> None:
+        self._stopped.set()
+        self._ticker.join()
+        with self._lock:
+            self._draw()
+            if self.live:
+                self.stream.write("\n")
@@ -0,0 +1,50 @@
+import csv
+from pathlib import Path
+
+from compressed import open_text
+
+
+def create_prox_map(prox_file: str | Path) -> dict[str, str]:
+    """Create a dict of { CCA ID : prox number } so we can look up patrons'
+    card numbers by their ID. Prox report does not have other identifiers like
+    username or email so we use CCA (universal, not student) ID.
+
+    Args:
+        prox_file (str|Path): path to the prox report CSV, may be gzip or
+            zstd compressed
+
+    Raises:
+        RuntimeError: if the CSV is not in the expected format
+
+    Returns:
+        dict: map of CCA IDs to prox numbers
+    """
+    with open_text(prox_file) as file:
+        # check the first line, which we'll always skip, to ensure CSV format
+        first_line: str = file.readline()
+        if "Active Accounts with Prox IDs" in first_line:
+            # skip the first 3 lines ("List of", empty line, then header row)
+            file.readline()
+            file.readline()
+        elif (
+            '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"'
+            in first_line
+        ):
+            # we already skipped the header row
+            pass
+        else:
+            raise RuntimeError(
+                f'The CSV of prox numbers "{prox_file}" was in an unexpected format. It should be a CSV export from OneCard either unmodified or with the two preamble rows removed but the header row present. Double-check the format of the file.'
+            )
+        # read rows from the rest of the CSV
+        reader = csv.reader(file)
+        # Universal ID => prox number mapping
+        # Prox report Univ IDs have varying number of leading zeroes e.g.
+        # "001000001", "010000001", so we strip them
+        map: dict[str, str] = {}
+        for row in reader:
+            # normalize IDs to be last 5 digits
+            prox = row[2].rstrip()[4:]
+            if prox != "" and int(prox) != 0:
+                map[row[0].lstrip("0")] = prox
+        return map
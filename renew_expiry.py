@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""Extend Koha expiration dates for continuing patrons at the start of a
+semester, using the same rules create_koha_csv.py applies to new patrons."""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import click
+
+from create_koha_csv import (
+    employee_included,
+    expiration_date,
+    report,
+    student_included,
+)
+from patron_update import confirm_network, koha_session, load_data, skipped_employee
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+    from workday.models import Person
+
+totals: Counter[str] = Counter()
+totals_lock = threading.Lock()
+
+
+def count(key: str) -> None:
+    with totals_lock:
+        totals[key] += 1
+
+
+def is_active(person: Person) -> bool:
+    """Mirror the filters create_koha_csv.py and patron_update.py use to
+    decide who should have a Koha account."""
+    from workday.models import Student
+
+    if isinstance(person, Student):
+        return student_included(person)
+    return (
+        employee_included(person)
+        and not person.is_contingent
+        and not skipped_employee(person)
+    )
+
+
+def target_expiry(person: Person, end_date: str) -> str:
+    from workday.models import Employee
+
+    # students expire at the end of the semester, see make_student_row
+    if isinstance(person, Employee):
+        return expiration_date(person, end_date)
+    return end_date
+
+
+def needs_renewal(current: str | None, target: str) -> bool:
+    # ISO dates compare correctly as strings. Only ever extend, never shorten
+    # an expiration that staff set by hand.
+    return current is None or current < target
+
+
+def renew_patron(http: Session, person: Person, end_date: str, dry_run: bool) -> None:
+    from termcolor import colored
+
+    from koha_patron.config import config
+    from koha_patron.patron import PATRON_READ_ONLY_FIELDS
+
+    response: Response = http.get(
+        f"{config['api_root']}/patrons?userid={person.username}&_match=exact"
+    )
+    if not response.ok:
+        print(colored(f"Error looking up {person.username}", "red"), response)
+        count("error")
+        return
+    patrons: list[dict] = response.json()
+    if len(patrons) == 0:
+        count("missing")
+        return
+
+    koha: dict = patrons[0]
+    target: str = target_expiry(person, end_date)
+    if not needs_renewal(koha.get("expiry_date"), target):
+        count("unchanged")
+        return
+
+    print(f"Renewing {koha['userid']} {koha.get('expiry_date')} => {target}")
+    if not dry_run:
+        koha["expiry_date"] = target
+        for field in PATRON_READ_ONLY_FIELDS:
+            koha.pop(field, None)
+        response = http.put(
+            f"{config['api_root']}/patrons/{koha['patron_id']}", json=koha
+        )
+        if not response.ok:
+            print(colored(f"Error renewing {person.username}", "red"), response)
+            print(response.text)
+            count("error")
+            return
+    count("renewed")
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.option(
+    "-w",
+    "--workday",
+    help="Workday JSON file, can be repeated",
+    multiple=True,
+    required=True,
+    type=click.Path(dir_okay=False, exists=True, readable=True),
+)
+@click.option(
+    "--end",
+    "end_date",
+    required=True,
+    help="Last day of the semester in YYYY-MM-DD format",
+)
+@click.option(
+    "-d",
+    "--dry-run",
+    help="Do not update patrons, only report what would change",
+    is_flag=True,
+)
+@click.option(
+    "--workers",
+    default=8,
+    show_default=True,
+    help="Number of concurrent Koha requests",
+    type=click.IntRange(min=1),
+)
+def main(workday: tuple[Path, ...], end_date: str, dry_run: bool, workers: int):
+    """Push new expiration dates to every active Workday person whose Koha
+    expiry is earlier than the one create_koha_csv.py would assign."""
+    from termcolor import colored
+
+    confirm_network()
+
+    http: Session = koha_session(pool_size=workers)
+
+    if dry_run:
+        print(colored("Dry run: no changes will be made.", "yellow"))
+
+    people: list[Person] = [
+        person for file in workday for person in load_data(file) if is_active(person)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [
+            pool.submit(renew_patron, http, person, end_date, dry_run)
+            for person in people
+        ]:
+            future.result()
+
+    print(
+        f"""
+=== Summary ===
+- Active Workday people: {len(people)}
+- Errors: {totals["error"]}
+- Missing from Koha: {totals["missing"]}
+- Renewed: {totals["renewed"]}
+- Already current: {totals["unchanged"]}"""
+    )
+    # warnings from expiration_date
+    report.write()
+
+
+if __name__ == "__main__":
+    main()
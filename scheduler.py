@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+"""Run patron syncs automatically when new Workday or prox files land. Every
+--interval seconds the scheduler (optionally) downloads the Workday files,
+checks the files' checksums, and syncs only the people whose Workday record
+or prox number changed since the last successful sync. A lock file keeps
+overlapping runs, e.g. from cron, from syncing at the same time, and the data
+files are deleted after each sync."""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+import click
+
+from fingerprint import fingerprint
+
+if TYPE_CHECKING:
+    from workday.models import Person
+
+# fingerprints of what was last synced, keyed hashes that can't be matched to
+# people without the fingerprint key, see fingerprint.py
+STATE_FILE: str = ".scheduler_state.json"
+LOCK_FILE: str = ".scheduler.lock"
+
+
+def load_state(path: Path) -> dict[str, dict[str, str]]:
+    if path.exists():
+        with open(path) as file:
+            return json.load(file)
+    return {"files": {}, "records": {}, "prox": {}}
+
+
+def save_state(path: Path, state: dict[str, dict[str, str]]) -> None:
+    partial: Path = path.with_suffix(".partial")
+    with open(partial, "w") as file:
+        json.dump(state, file)
+    os.replace(partial, path)
+
+
+@contextmanager
+def lock(path: Path) -> Iterator[bool]:
+    """Yields whether we hold the lock, without waiting for another run"""
+    with open(path, "w") as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def delta(
+    people: list[Person], prox_map: dict[str, str], state: dict[str, dict[str, str]]
+) -> tuple[list[Person], dict[str, str], dict[str, str]]:
+    """People whose record or prox number changed since the last sync, plus
+    the fingerprints to save once they're synced. Prox numbers are only
+    compared when we have a prox report."""
+    changed: list[Person] = []
+    records: dict[str, str] = {}
+    proxes: dict[str, str] = {}
+    for person in people:
+        key: str = fingerprint(person.universal_id)
+        records[key] = fingerprint(person.model_dump_json())
+        if prox_map:
+            proxes[key] = fingerprint(prox_map.get(person.universal_id, ""))
+        if state["records"].get(key) != records[key] or (
+            prox_map and state["prox"].get(key) != proxes[key]
+        ):
+            changed.append(person)
+    return changed, records, proxes
+
+
+# patron_update.py output, names start with the date (& target), they hold
+# patron data so they're deleted with the input files
+OUTPUT_PATTERNS: tuple[str, ...] = ("*-missing-*.json", "*-patron-bulk-update.csv")
+
+
+def clean(files: list[Path]) -> None:
+    """Delete the data files, sync output & the validated records cached from
+    the data files"""
+    from workday.cache import CACHE_DIR
+
+    outputs: list[Path] = [
+        output for pattern in OUTPUT_PATTERNS for output in Path().glob(pattern)
+    ]
+    for file in files + outputs:
+        file.unlink(missing_ok=True)
+        print(f"Deleted {file}")
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+def download(source: str, data_dir: Path) -> None:
+    from koha_patron.dl_int_json import FILES, LOG_FILE, last_generations, source_for
+    from koha_patron.dl_int_json import download as fetch
+
+    log: Path = data_dir / LOG_FILE
+    generations: dict[str, str] = last_generations(log)
+    entries: list[dict[str, Any]] = [
+        fetch(source_for(source), name, data_dir, generations.get(name), False)
+        for name in FILES
+    ]
+    with open(log, "a") as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + "\n")
+
+
+def run_once(
+    data_dir: Path,
+    prox: Path,
+    source: str | None,
+    full: bool,
+    dry_run: bool,
+    cleanup: bool,
+    concurrency: int,
+) -> dict[str, int] | None:
+    """One scheduler cycle, returns sync totals or None if nothing ran"""
+    from termcolor import colored
+
+    import patron_update
+    from koha_patron.dl_int_json import FILES
+    from prox import create_prox_map
+    from workday.cache import file_hash
+
+    # sync() fills these, don't count a previous cycle's patrons
+    patron_update.results.clear()
+    if source:
+        download(source, data_dir)
+
+    state_file: Path = data_dir / STATE_FILE
+    state: dict[str, dict[str, str]] = load_state(state_file)
+    workday: list[Path] = [
+        data_dir / name for name in FILES if (data_dir / name).exists()
+    ]
+    files: list[Path] = workday + ([prox] if prox.exists() else [])
+    hashes: dict[str, str] = {str(file): file_hash(file) for file in files}
+    if not workday or (not full and hashes.items() <= state["files"].items()):
+        print("No new Workday or prox files" if workday else "No Workday files")
+        # e.g. files downloaded again but unchanged, a new prox report waits
+        # for the next Workday files
+        if cleanup:
+            clean([f for f in files if state["files"].get(str(f)) == hashes[str(f)]])
+        return None
+
+    prox_map: dict[str, str] = create_prox_map(prox) if prox.exists() else {}
+    people: list[Person] = [
+        person for file in workday for person in patron_update.load_data(file)
+    ]
+    if full:
+        state = {"files": {}, "records": {}, "prox": {}}
+    changed, records, proxes = delta(people, prox_map, state)
+    print(f"{len(changed)} of {len(people)} people changed since the last sync")
+
+    totals: dict[str, int] | None = None
+    if changed:
+        populations: dict[str, list[Person]] = {}
+        for person in changed:
+            populations.setdefault(type(person).__name__, []).append(person)
+        totals = patron_update.sync(populations, prox_map, dry_run, concurrency)
+        if totals["error"]:
+            # keep the old fingerprints so everyone is retried next time
+            print(colored(f"{totals['error']} errors, will retry", "red"))
+            return totals
+
+    if not dry_run:
+        # missing & exported patrons are checked again until they're added to
+        # or updated in Koha, a bulk update CSV may never be imported
+        retry: set[str] = {
+            fingerprint(person["universal_id"])
+            for result in patron_update.results.values()
+            for person in result["missing"]
+        } | {
+            fingerprint(person.universal_id)
+            for result in patron_update.results.values()
+            for _, person, _ in result["pending"]
+        }
+        state["records"].update(
+            {key: value for key, value in records.items() if key not in retry}
+        )
+        state["prox"].update(
+            {key: value for key, value in proxes.items() if key not in retry}
+        )
+        # unchanged files are skipped, so only remember them once everyone in
+        # them is in Koha & up to date
+        if not retry:
+            state["files"] = hashes
+        save_state(state_file, state)
+        if cleanup:
+            clean(files)
+    return totals
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.option(
+    "--data-dir",
+    default=".",
+    show_default=True,
+    help="Directory the Workday files are downloaded to or dropped in",
+    type=click.Path(file_okay=False, exists=True, writable=True, path_type=Path),
+)
+@click.option(
+    "-p",
+    "--prox",
+    default="data/prox.csv",
+    show_default=True,
+    help="Prox CSV file to watch",
+    type=click.Path(dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-s",
+    "--source",
+    help="gs:// bucket, file:// URL, or directory to download Workday files from each cycle",
+)
+@click.option(
+    "-i",
+    "--interval",
+    default=3600,
+    show_default=True,
+    help="Seconds between checks",
+    type=click.IntRange(min=1),
+)
+@click.option("--once", help="Run one cycle and exit, e.g. from cron", is_flag=True)
+@click.option(
+    "--full",
+    help="Sync everyone in the files, not only people who changed",
+    is_flag=True,
+)
+@click.option(
+    "-d",
+    "--dry-run",
+    help="Do not update patrons, keep files, and don't remember what was synced",
+    is_flag=True,
+)
+@click.option(
+    "--keep-files",
+    help="Do not delete the Workday and prox files after syncing",
+    is_flag=True,
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    default=16,
+    show_default=True,
+    help="Maximum concurrent Koha requests",
+    type=click.IntRange(min=1),
+)
+def main(
+    data_dir: Path,
+    prox: Path,
+    source: str | None,
+    interval: int,
+    once: bool,
+    full: bool,
+    dry_run: bool,
+    keep_files: bool,
+    concurrency: int,
+):
+    """Sync Workday and prox changes to Koha as new files arrive"""
+    from termcolor import colored
+
+    from patron_update import check_cca_dns
+
+    while True:
+        with lock(data_dir / LOCK_FILE) as locked:
+            if not locked:
+                print(colored("Another sync is running, skipping this cycle", "yellow"))
+            elif not check_cca_dns():
+                print(
+                    colored(
+                        "Not on the CCA network or VPN, skipping this cycle", "yellow"
+                    )
+                )
+            else:
+                run_once(
+                    data_dir,
+                    prox,
+                    source,
+                    full,
+                    dry_run,
+                    cleanup=not (keep_files or dry_run),
+                    concurrency=concurrency,
+                )
+        if once:
+            return
+        # only the first cycle syncs everyone
+        full = False
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
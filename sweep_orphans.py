@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""Find Koha patrons who no longer appear in Workday, e.g. departed staff and
+graduated students, by streaming every Koha patron page by page and checking
+it against sets of the usernames & universal IDs in the Workday files. This is
+the reverse of patron_update.py, which walks Workday and looks up Koha."""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import click
+
+from create_koha_csv import employee_included, student_included
+from koha_mappings import category
+from patron_update import confirm_network, koha_session, load_data
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+    from workday.models import Person
+
+# only patrons in categories we load from Workday can be orphans, community
+# borrowers, ILL accounts etc. never appear in Workday
+SWEPT_CATEGORIES: frozenset[str] = frozenset(category.values())
+
+totals: Counter[str] = Counter()
+totals_lock = threading.Lock()
+
+
+def count(key: str) -> None:
+    with totals_lock:
+        totals[key] += 1
+
+
+def is_current(person: Person) -> bool:
+    """Whether create_koha_csv.py would give the person an account, so
+    departed staff who remain in the Workday export are orphans too"""
+    from workday.models import Student
+
+    if isinstance(person, Student):
+        return student_included(person)
+    return employee_included(person)
+
+
+def workday_ids(files: tuple[Path, ...], use_cache: bool = True) -> set[str]:
+    """Lowercased usernames & universal IDs of current people in the Workday
+    files, one set so each Koha patron costs two hash lookups"""
+    ids: set[str] = set()
+    for file in files:
+        for person in filter(is_current, load_data(file, use_cache)):
+            ids.add(person.username.lower())
+            ids.add(person.universal_id)
+    return ids
+
+
+def koha_patrons(http: Session, per_page: int = 1000) -> Iterator[dict[str, Any]]:
+    """Yield every Koha patron, one page of results in memory at a time.
+    Extended attributes are embedded so we can read UNIVID without another
+    request per patron."""
+    from koha_patron.config import config
+
+    page: int = 1
+    while True:
+        response: Response = http.get(
+            f"{config['api_root']}/patrons",
+            # a stable order so updates made between pages can't shift
+            # patrons onto a page we've already read
+            params={"_page": page, "_per_page": per_page, "_order_by": "patron_id"},
+            headers={"x-koha-embed": "extended_attributes"},
+        )
+        response.raise_for_status()
+        patrons: list[dict[str, Any]] = response.json()
+        yield from patrons
+        if len(patrons) < per_page:
+            return
+        page += 1
+
+
+def universal_id(koha: dict[str, Any]) -> str | None:
+    for attribute in koha.get("extended_attributes") or []:
+        if attribute.get("type") == "UNIVID":
+            return attribute.get("value")
+    return None
+
+
+def is_orphan(koha: dict[str, Any], ids: set[str]) -> bool:
+    if koha.get("category_id") not in SWEPT_CATEGORIES:
+        return False
+    if (koha.get("userid") or "").lower() in ids:
+        return False
+    return universal_id(koha) not in ids
+
+
+def needs_expiry(current: str | None, target: str) -> bool:
+    # ISO dates compare correctly as strings. Only ever bring an expiration
+    # forward, patrons who already expired keep their date.
+    return current is None or current > target
+
+
+def update_orphan(
+    http: Session, koha: dict[str, Any], expire: str | None, flag: str | None
+) -> None:
+    """PUT the record we already have from the patron listing, no GET needed"""
+    from termcolor import colored
+
+    from koha_patron.config import config
+    from koha_patron.patron import PATRON_READ_ONLY_FIELDS
+
+    record: dict[str, Any] = dict(koha)
+    if expire and needs_expiry(record.get("expiry_date"), expire):
+        record["expiry_date"] = expire
+    if flag and flag not in (record.get("staff_notes") or ""):
+        record["staff_notes"] = "\n".join(
+            filter(None, [record.get("staff_notes"), flag])
+        )
+    if record == koha:
+        count("unchanged")
+        return
+
+    for field in (*PATRON_READ_ONLY_FIELDS, "extended_attributes"):
+        record.pop(field, None)
+    response: Response = http.put(
+        f"{config['api_root']}/patrons/{record['patron_id']}", json=record
+    )
+    if not response.ok:
+        print(colored(f"Error updating {record.get('userid')}", "red"), response)
+        print(response.text)
+        count("error")
+        return
+    count("updated")
+
+
+def mk_orphans_file(orphans: dict[str, list[dict[str, Any]]]) -> str:
+    filename: str = f"{date.today().isoformat()}-orphans.json"
+    with open(filename, "w") as file:
+        json.dump(orphans, file, indent=2)
+    return filename
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.option(
+    "-w",
+    "--workday",
+    help="Workday JSON file, pass both the employee and student files",
+    multiple=True,
+    required=True,
+    type=click.Path(dir_okay=False, exists=True, readable=True),
+)
+@click.option(
+    "--expire",
+    help="Set orphans' expiration date to this YYYY-MM-DD date if it is later",
+)
+@click.option(
+    "--flag",
+    help="Append this text to orphans' staff notes, e.g. 'Not in Workday 2024-06'",
+)
+@click.option(
+    "-d",
+    "--dry-run",
+    help="Only report orphans, even if --expire or --flag is given",
+    is_flag=True,
+)
+@click.option(
+    "--per-page",
+    default=1000,
+    show_default=True,
+    help="Number of Koha patrons to request per page",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--workers",
+    default=8,
+    show_default=True,
+    help="Number of concurrent Koha updates",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--no-cache",
+    help="Re-parse Workday files instead of using cached validated records",
+    is_flag=True,
+)
+def main(
+    workday: tuple[Path, ...],
+    expire: str | None,
+    flag: str | None,
+    dry_run: bool,
+    per_page: int,
+    workers: int,
+    no_cache: bool,
+):
+    """Report Koha patrons in Workday categories who are in neither Workday
+    file, grouped by category, and optionally expire or flag them."""
+    from termcolor import colored
+
+    confirm_network()
+
+    if len(workday) < 2:
+        print(
+            colored(
+                "Only one Workday file given, everyone in the other is an orphan.",
+                "yellow",
+            )
+        )
+    update: bool = bool(expire or flag) and not dry_run
+    if (expire or flag) and dry_run:
+        print(colored("Dry run: no changes will be made.", "yellow"))
+
+    ids: set[str] = workday_ids(workday, use_cache=not no_cache)
+    http: Session = koha_session(pool_size=workers)
+
+    # updates run in the background while later pages are still streaming
+    orphans: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    futures: list[Future] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for koha in koha_patrons(http, per_page):
+            count("patrons")
+            if not is_orphan(koha, ids):
+                continue
+            orphans[koha["category_id"]].append(
+                {
+                    "patron_id": koha["patron_id"],
+                    "userid": koha.get("userid"),
+                    "universal_id": universal_id(koha),
+                    "firstname": koha.get("firstname"),
+                    "surname": koha.get("surname"),
+                    "expiry_date": koha.get("expiry_date"),
+                }
+            )
+            if update:
+                futures.append(pool.submit(update_orphan, http, koha, expire, flag))
+        for future in futures:
+            future.result()
+
+    print(
+        f"""
+=== Summary ===
+- Koha patrons checked: {totals["patrons"]}
+- Not in Workday: {sum(len(o) for o in orphans.values())}"""
+    )
+    for categorycode, patrons in sorted(orphans.items()):
+        print(f"  - {categorycode}: {len(patrons)}")
+    if update:
+        print(
+            f"""- Updated: {totals["updated"]}
+- Already expired or flagged: {totals["unchanged"]}
+- Errors: {totals["error"]}"""
+        )
+    if orphans:
+        print(f"\nWrote orphans by category to {mk_orphans_file(orphans)}")
+
+
+if __name__ == "__main__":
+    main()
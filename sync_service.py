@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""Apply single patron changes, e.g. a replaced ID card or a new preferred
+name, within a second instead of waiting for the next patron_update.py run.
+A local HTTP service accepts change events, merges bursts of events for the
+same person, and syncs each person with patron_update.py's logic over one
+session whose OAuth token is renewed when it expires.
+
+    curl -d '{"universal_id": "1000001", "prox": "57426"}' localhost:8765
+
+An event has a universal_id and any of prox, first_name, and last_name. POST a
+list to send several events at once; GET returns counts of events so far."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import click
+
+import patron_update
+
+if TYPE_CHECKING:
+    from workday.models import Person
+
+EVENT_FIELDS: tuple[str, ...] = ("universal_id", "prox", "first_name", "last_name")
+
+counts: Counter[str] = Counter()
+counts_lock = threading.Lock()
+
+
+def count(key: str) -> None:
+    with counts_lock:
+        counts[key] += 1
+
+
+class Coalescer:
+    """Queue of change events merged per universal ID. An event is applied
+    `window` seconds after the first event for that person arrived; events
+    arriving in the meantime are merged into it (later values win) so a burst
+    of changes makes one write."""
+
+    def __init__(self, apply: Callable[[dict[str, str]], None], window: float = 0.25):
+        self.apply = apply
+        self.window: float = window
+        self._pending: dict[str, dict[str, str]] = {}
+        self._due: dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._stopped: bool = False
+
+    def submit(self, event: dict[str, str]) -> None:
+        with self._condition:
+            uid: str = event["universal_id"]
+            if uid in self._pending:
+                count("coalesced")
+            self._pending.setdefault(uid, {}).update(event)
+            self._due.setdefault(uid, time.monotonic() + self.window)
+            self._condition.notify()
+
+    def due(self) -> list[dict[str, str]]:
+        """Wait for & remove the events whose window has passed, or all of
+        them once the queue is stopped"""
+        with self._condition:
+            while True:
+                now: float = time.monotonic()
+                ready: list[str] = [
+                    uid for uid, t in self._due.items() if t <= now or self._stopped
+                ]
+                if ready or self._stopped:
+                    for uid in ready:
+                        del self._due[uid]
+                    return [self._pending.pop(uid) for uid in ready]
+                timeout: float | None = (
+                    min(self._due.values()) - now if self._due else None
+                )
+                self._condition.wait(timeout)
+
+    def run(self) -> None:
+        """Apply events until stopped, then apply what's left"""
+        while True:
+            events: list[dict[str, str]] = self.due()
+            if not events and self._stopped:
+                return
+            for event in events:
+                try:
+                    self.apply(event)
+                except Exception as error:
+                    count("error")
+                    print(f"Error applying {event}: {error!r}")
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+
+def parse_events(body: bytes, people: dict[str, Person]) -> list[dict[str, str]]:
+    """Validate a request body of one event or a list of them"""
+    data: Any = json.loads(body)
+    events: list = data if isinstance(data, list) else [data]
+    for event in events:
+        if not isinstance(event, dict) or not event.get("universal_id"):
+            raise ValueError("Every event needs a universal_id")
+        unknown: set[str] = set(event) - set(EVENT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown event fields: {', '.join(sorted(unknown))}")
+        if str(event["universal_id"]) not in people:
+            raise LookupError(
+                f"No one in Workday has universal ID {event['universal_id']}"
+            )
+    return [{k: str(v) for k, v in event.items() if v is not None} for event in events]
+
+
+def sync_person(
+    people: dict[str, Person], event: dict[str, str], dry_run: bool
+) -> None:
+    """Apply one merged event with patron_update.py's check & update logic"""
+    person: Person = people[event["universal_id"]]
+    names: dict[str, str] = {
+        field: event[field] for field in ("first_name", "last_name") if field in event
+    }
+    if names:
+        # remember the new name so later card-only events don't revert it
+        person = people[event["universal_id"]] = person.model_copy(update=names)
+
+    patron_update.check_patron(person, event.get("prox"))
+    with patron_update.results_lock:
+        result: dict[str, Any] = patron_update.results[type(person).__name__]
+        pending: list = result["pending"]
+        result["pending"] = []
+    for koha, workday, prox in pending:
+        patron_update.update_patron(koha, workday, prox, dry_run)
+    count("applied")
+
+
+def make_handler(people: dict[str, Person], queue: Coalescer):
+    class EventHandler(BaseHTTPRequestHandler):
+        def respond(self, status: int, body: dict[str, Any]) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        def do_GET(self) -> None:
+            with counts_lock:
+                self.respond(200, dict(counts))
+
+        def do_POST(self) -> None:
+            length: int = int(self.headers.get("Content-Length", 0))
+            try:
+                events: list[dict[str, str]] = parse_events(
+                    self.rfile.read(length), people
+                )
+            except LookupError as error:
+                return self.respond(404, {"error": str(error)})
+            except ValueError as error:
+                # includes JSONDecodeError
+                return self.respond(400, {"error": str(error)})
+            for event in events:
+                count("received")
+                queue.submit(event)
+            self.respond(202, {"queued": len(events)})
+
+        def log_message(self, format: str, *args) -> None:
+            # events are logged when they're applied
+            pass
+
+    return EventHandler
+
+
+@click.command()
+@click.help_option("--help", "-h")
+@click.option(
+    "-w",
+    "--workday",
+    help="Workday JSON file, can be repeated to accept events for employees and students",
+    multiple=True,
+    required=True,
+    type=click.Path(dir_okay=False, exists=True, readable=True),
+)
+@click.option(
+    "--host",
+    default="127.0.0.1",
+    show_default=True,
+    help="Address to listen on, events are not authenticated so keep it local",
+)
+@click.option("--port", default=8765, show_default=True, type=int)
+@click.option(
+    "--window",
+    default=0.25,
+    show_default=True,
+    help="Seconds to wait for more events for the same person before syncing",
+    type=click.FloatRange(min=0),
+)
+@click.option(
+    "-d",
+    "--dry-run",
+    help="Do not update patrons, only log the changes events would make",
+    is_flag=True,
+)
+@click.option(
+    "--no-cache",
+    help="Re-parse Workday files instead of using cached validated records",
+    is_flag=True,
+)
+def main(
+    workday: tuple[Path, ...],
+    host: str,
+    port: int,
+    window: float,
+    dry_run: bool,
+    no_cache: bool,
+):
+    """Run a local service that syncs patron change events to Koha"""
+    from termcolor import colored
+
+    from koha_patron.concurrency import AdaptiveLimiter
+
+    patron_update.confirm_network()
+
+    people: dict[str, Person] = {}
+    for file in workday:
+        for person in patron_update.load_data(file, use_cache=not no_cache):
+            people[person.universal_id] = person
+            patron_update.results.setdefault(
+                type(person).__name__, patron_update.new_results()
+            )
+
+    # open the session & get a token now so the first event isn't slowed down
+    patron_update.http = patron_update.koha_session()
+    patron_update.limiter = AdaptiveLimiter(initial=1, maximum=4)
+    if dry_run:
+        print(colored("Dry run: no changes will be made.", "yellow"))
+
+    queue = Coalescer(lambda event: sync_person(people, event, dry_run), window)
+    worker = threading.Thread(target=queue.run, daemon=True)
+    worker.start()
+    server = ThreadingHTTPServer((host, port), make_handler(people, queue))
+    print(f"Accepting events for {len(people)} people on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.stop()
+        worker.join()
+        print(json.dumps(dict(counts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from bulk_update import mismatches, read_export, write_export
+
+
+def koha(i: int) -> dict:
+    return {
+        "patron_id": i,
+        "userid": f"staff{i}",
+        "cardnumber": str(2000000 + i),
+        "firstname": "Staff",
+        "preferred_name": "Staff",
+        "surname": f"Member {i}",
+        "statistics_2": "old card",
+        "library_id": "SF",
+        "category_id": "STAFF",
+        "expiry_date": "2030-01-01",
+    }
+
+
+def test_export_round_trip(tmp_path):
+    records: list[dict] = [koha(i) for i in range(3)]
+    path = tmp_path / "export.csv"
+    assert write_export(records, path) == str(path)
+
+    rows: list[dict[str, str]] = read_export(path)
+    assert [row["userid"] for row in rows] == ["staff0", "staff1", "staff2"]
+    # API field names are mapped to import columns, unchanged fields are left out
+    assert rows[0]["sort2"] == "old card"
+    assert rows[0]["branchcode"] == "SF"
+    assert "expiry_date" not in rows[0]
+    assert mismatches(rows[0], records[0]) == []
+
+
+def test_mismatches():
+    row: dict[str, str] = {
+        "cardnumber": "123",
+        "firstname": "New",
+        "surname": "Name",
+        "preferred_name": "",
+    }
+    imported: dict = {"cardnumber": "123", "firstname": "Old", "surname": "Name"}
+    assert mismatches(row, imported) == ["firstname 'Old' != 'New'"]
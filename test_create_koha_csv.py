@@ -0,0 +1,142 @@
+import csv
+import json
+import random
+
+import pytest
+from click.testing import CliRunner
+
+import create_koha_csv
+from create_koha_csv import (
+    WarningReport,
+    make_employee_row,
+    make_employee_rows,
+    make_student_row,
+    make_student_rows,
+)
+from koha_mappings import fac_depts, stu_major
+
+
+def students(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    majors: list[str] = list(stu_major)[:5] + ["Unmapped Program"]
+    return [
+        {
+            "academic_level": rng.choice(["Undergraduate", "Graduate", "Pre-College"]),
+            "first_name": f"First{i}",
+            "inst_email": rng.choice([f"s{i}@cca.edu", None]),
+            "last_name": f"Last{i}",
+            "primary_program": rng.choice(majors),
+            "programs": [{"program": rng.choice(majors), "program_type": "Major"}],
+            "student_id": f"s{i}",
+            "universal_id": str(3000000 + i),
+            "username": rng.choice([f"student{i}", "sraffeld"]),
+        }
+        for i in range(n)
+    ]
+
+
+def employees(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    depts: list[str | None] = list(fac_depts)[:5] + ["Unmapped Dept", None, ""]
+    return [
+        {
+            "active_status": rng.random() > 0.1,
+            "department": rng.choice(depts),
+            "employee_id": f"e{i}",
+            "etype": rng.choice(
+                [
+                    "Staff",
+                    "Faculty",
+                    "Instructors",
+                    None,
+                    "Contingent Employees/Contractors",
+                ]
+            ),
+            "etype_future": rng.choice([None, "Staff"]),
+            "first_name": f"First{i}",
+            "is_contingent": rng.random() > 0.9,
+            "job_profile": rng.choice(
+                [None, "Special Programs Instructor", "Atelier Instructor", "Animation"]
+            ),
+            "last_name": f"Last{i}",
+            "program": rng.choice(depts),
+            "universal_id": str(4000000 + i),
+            "username": f"employee{i}",
+            "work_email": rng.choice([f"e{i}@cca.edu", None]),
+            "work_phone": rng.choice([None, "415-555-0100"]),
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("end_date", ["2025-12-15", "2025-05-10", "2025-10-01"])
+def test_batch_matches_row_by_row(monkeypatch, end_date):
+    prox_map: dict[str, str] = {"3000001": " 12345 ", "4000002": "54321"}
+    outputs: list[tuple[list[dict], dict]] = []
+    for student_fn, employee_fn in [
+        (make_student_row, make_employee_row),
+        (make_student_rows, make_employee_rows),
+    ]:
+        report = WarningReport()
+        monkeypatch.setattr(create_koha_csv, "report", report)
+        if student_fn is make_student_row:
+            rows = [student_fn(s, prox_map, end_date) for s in students(300)]
+            rows += [employee_fn(e, prox_map, end_date) for e in employees(300)]
+            rows = [row for row in rows if row]
+        else:
+            rows = student_fn(students(300), prox_map, end_date)
+            rows += employee_fn(employees(300), prox_map, end_date)
+        outputs.append((rows, report.groups))
+
+    assert outputs[0] == outputs[1]
+
+
+def test_manifest_only_skips_imported_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(create_koha_csv, "report", WarningReport())
+    (tmp_path / "prox.csv").write_text(
+        '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"\n'
+    )
+    (tmp_path / "student_data.json").write_text(json.dumps(students(20)))
+    (tmp_path / "employee_data.json").write_text(json.dumps(employees(20)))
+    args: list[str] = ["prox.csv", "--end", "2025-12-15", "--no-cache"]
+
+    def rows() -> int:
+        result = CliRunner().invoke(create_koha_csv.main, args)
+        assert result.exit_code == 0, result.output
+        return len((tmp_path / "patron_bulk_import.csv").read_text().splitlines()) - 1
+
+    written: int = rows()
+    assert written > 0
+    # the import failed or hasn't happened, so the rows are written again
+    assert rows() == written
+    result = CliRunner().invoke(create_koha_csv.main, ["--commit-manifest"])
+    assert result.exit_code == 0, result.output
+    assert rows() == 0
+    # userids aren't stored in the clear
+    assert "student1" not in (tmp_path / "patron_bulk_import.manifest.json").read_text()
+
+
+def test_rejected_rows_stay_pending(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(create_koha_csv, "report", WarningReport())
+    (tmp_path / "prox.csv").write_text(
+        '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"\n'
+    )
+    (tmp_path / "employee_data.json").write_text(json.dumps(employees(20)))
+    (tmp_path / "student_data.json").write_text(json.dumps(students(20)))
+    args: list[str] = ["prox.csv", "--end", "2025-12-15", "--no-cache"]
+
+    def userids() -> list[str]:
+        result = CliRunner().invoke(create_koha_csv.main, args)
+        assert result.exit_code == 0, result.output
+        with open(tmp_path / "patron_bulk_import.csv") as file:
+            return [row["userid"] for row in csv.DictReader(file)]
+
+    rejected: str = userids()[0]
+    (tmp_path / "rejected.txt").write_text(f"{rejected}\n")
+    result = CliRunner().invoke(
+        create_koha_csv.main, ["--commit-manifest", "--rejected", "rejected.txt"]
+    )
+    assert result.exit_code == 0, result.output
+    assert userids() == [rejected]
@@ -0,0 +1,30 @@
+import stat
+import sys
+from types import SimpleNamespace
+
+import fingerprint
+
+# conftest.py replaces key() with a fixed test key
+real_key = fingerprint.key.__wrapped__
+
+
+def test_fingerprint_is_keyed(monkeypatch):
+    first: str = fingerprint.fingerprint("2000001")
+    assert first == fingerprint.fingerprint("2000001")
+    monkeypatch.setattr(fingerprint, "key", lambda: b"another key")
+    assert fingerprint.fingerprint("2000001") != first
+
+
+def test_key_from_config(monkeypatch):
+    config = SimpleNamespace(config={"fingerprint_key": "secret"})
+    monkeypatch.setitem(sys.modules, "koha_patron.config", config)
+    assert real_key() == b"secret"
+
+
+def test_key_file_is_generated_once(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "koha_patron.config", SimpleNamespace(config={}))
+    monkeypatch.setattr(fingerprint, "KEY_FILE", tmp_path / ".fingerprint_key")
+    generated: bytes = real_key()
+    assert len(generated) == 64
+    assert real_key() == generated
+    assert stat.S_IMODE((tmp_path / ".fingerprint_key").stat().st_mode) == 0o600
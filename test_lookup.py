@@ -0,0 +1,76 @@
+import json
+import sqlite3
+
+from click.testing import CliRunner
+
+import lookup
+
+
+def write_files(tmp_path, employee) -> dict[str, str]:
+    employees = tmp_path / "employee_data.json"
+    employees.write_text(
+        json.dumps(
+            [
+                employee(
+                    1,
+                    first_name="Ann",
+                    last_name="Lee",
+                    universal_id="1000001",
+                    username="alee",
+                    work_email="ALee@cca.edu",
+                )
+            ]
+        )
+    )
+    prox = tmp_path / "prox.csv"
+    prox.write_text(
+        '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"\n'
+        '"001000001","","000057426       ","Lee","Ann","12/12/2050","False"\n'
+    )
+    missing = tmp_path / "2024-01-01-missing-employees.json"
+    missing.write_text(json.dumps([{"username": "alee", "universal_id": "1000001"}]))
+    return {str(employees): "workday", str(prox): "prox", str(missing): "missing"}
+
+
+def test_find_by_any_identifier(tmp_path, employee):
+    files: dict[str, str] = write_files(tmp_path, employee)
+    index = tmp_path / "index.sqlite"
+    lookup.build(index, files, use_cache=False)
+
+    db = sqlite3.connect(index)
+    db.row_factory = sqlite3.Row
+    assert lookup.is_current(db, files)
+    for query in ("alee", "ALEE", "1000001", "001000001", "alee@cca.edu", "57426"):
+        assert [row["username"] for row in lookup.find(db, query)] == ["alee"], query
+    assert lookup.find(db, "nobody") == []
+
+
+def test_cli_describes_person(tmp_path, employee):
+    files: dict[str, str] = write_files(tmp_path, employee)
+    workday, prox, missing = files
+    index = str(tmp_path / "index.sqlite")
+    args: list[str] = ["-w", workday, "-p", prox, "-m", missing, "--index", index]
+
+    result = CliRunner().invoke(lookup.main, [*args, "--no-cache", "57426"])
+    assert result.exit_code == 0, result.output
+    assert "Indexing" in result.output
+    assert "- Prox number: 57426" in result.output
+    assert "- Category: STAFF" in result.output
+    assert f"- In missing-patron files: {missing}" in result.output
+
+    # unchanged files reuse the index
+    result = CliRunner().invoke(lookup.main, [*args, "--no-cache", "alee"])
+    assert "Indexing" not in result.output
+
+
+def test_koha_row_keeps_the_script_report(monkeypatch, employee):
+    import create_koha_csv
+    from workday.models import Employee
+
+    report = create_koha_csv.WarningReport()
+    monkeypatch.setattr(create_koha_csv, "report", report)
+    # no program or department, so there is a warning
+    row, warnings = lookup.koha_row(Employee(**employee(1)), {}, "2025-12-15")
+    assert row is not None
+    assert len(warnings) > 0
+    assert create_koha_csv.report is report and len(report) == 0
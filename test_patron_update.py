@@ -0,0 +1,75 @@
+from collections.abc import Callable
+
+import pytest
+
+from patron_update import (
+    CARD,
+    NAME,
+    VERIFY,
+    differs,
+    fingerprint,
+    has_changed,
+    name_fingerprint,
+    normalize_name,
+    priority,
+)
+from workday.models import Employee
+
+
+@pytest.fixture
+def person(employee) -> Callable[..., Employee]:
+    def make(first: str = "José", last: str = "Núñez") -> Employee:
+        return Employee.model_validate(
+            employee(
+                1,
+                first_name=first,
+                last_name=last,
+                username="jnunez",
+                work_email="jnunez@cca.edu",
+            )
+        )
+
+    return make
+
+
+def koha(**fields) -> dict:
+    return {"cardnumber": "12345", "firstname": "José", "surname": "Núñez"} | fields
+
+
+def test_normalize_name():
+    decomposed: str = "Jose\u0301"
+    assert decomposed != "José"
+    assert normalize_name(decomposed) == "José"
+    assert normalize_name("  Mary   Ann ") == "Mary Ann"
+    assert normalize_name(None) == ""
+
+
+def test_equivalent_values_are_unchanged(person):
+    workday: Employee = person("José ", "Núñez")
+    record: dict = koha(cardnumber=" 12345 ")
+    assert differs(record, workday, "12345")
+    assert not has_changed(record, workday, "12345")
+
+
+def test_preferred_name_counts_as_first_name(person):
+    record: dict = koha(firstname="Joseph", preferred_name="José")
+    assert not has_changed(record, person(), None)
+
+
+def test_real_changes(person):
+    assert has_changed(koha(), person("Joe"), None)
+    assert has_changed(koha(), person(last="Nunez"), None)
+    # leading zeroes are significant for scanned cards
+    assert has_changed(koha(cardnumber="12345"), person(), "012345")
+
+
+def test_priority(person):
+    workday: Employee = person()
+    key: str = fingerprint(workday.universal_id)
+    synced: dict = {"card": fingerprint("12345"), "name": name_fingerprint(workday)}
+    # nothing remembered: anyone with a prox number may have a new card
+    assert priority(workday, "12345", {}) == CARD
+    assert priority(workday, None, {}) == NAME
+    assert priority(workday, " 12345", {key: synced}) == VERIFY
+    assert priority(workday, "54321", {key: synced}) == CARD
+    assert priority(person(first="Joe"), "12345", {key: synced}) == NAME
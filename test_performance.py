@@ -0,0 +1,192 @@
+"""Memory & runtime regression tests. Each workload runs on generated data of
+a fixed size and is compared to perf_baseline.json: peak traced memory may
+grow by MEMORY_TOLERANCE and runtime, measured relative to a fixed pure-Python
+workload so the baseline holds across machines, by TIME_TOLERANCE. Timings depend on
+the machine's load, so these only run with PERF_TESTS=1. After an intended
+change, rewrite the baseline with
+`PERF_TESTS=1 PERF_UPDATE_BASELINE=1 uv run pytest test_performance.py`."""
+
+import gc
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from click.testing import CliRunner
+
+import create_koha_csv
+from create_koha_csv import WarningReport, make_employee_row, make_student_row
+from prox import create_prox_map
+from test_create_koha_csv import employees, students
+from workday import cache
+from workday.models import Student
+from workday.utils import get_entries
+
+# skipped unless PERF_TESTS=1, see conftest.py
+pytestmark = pytest.mark.perf
+
+BASELINE = Path(__file__).with_name("perf_baseline.json")
+UPDATE: bool = bool(os.environ.get("PERF_UPDATE_BASELINE"))
+MEMORY_TOLERANCE: float = float(os.environ.get("PERF_MEMORY_TOLERANCE", "1.25"))
+TIME_TOLERANCE: float = float(os.environ.get("PERF_TIME_TOLERANCE", "2.0"))
+
+PEOPLE: int = 1000
+PROX_ROWS: int = 2000
+END_DATE: str = "2025-12-15"
+
+
+def calibration() -> float:
+    """Seconds this machine takes for a fixed workload, best of 3"""
+    timings: list[float] = []
+    for _ in range(3):
+        start: float = time.perf_counter()
+        sorted(str(i) for i in range(200_000))
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(workload: Callable[[], object]) -> tuple[int, float]:
+    """Peak traced bytes of one run & the best of 3 untraced runs' time,
+    relative to calibration()"""
+    gc.collect()
+    tracemalloc.start()
+    workload()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings: list[float] = []
+    for _ in range(3):
+        start: float = time.perf_counter()
+        workload()
+        timings.append(time.perf_counter() - start)
+    return peak, min(timings) / calibration()
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    expected: dict[str, dict[str, float]] = (
+        json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    )
+    yield expected
+    if UPDATE:
+        BASELINE.write_text(json.dumps(expected, indent=2, sort_keys=True) + "\n")
+
+
+def check(baseline: dict, name: str, workload: Callable[[], object]) -> None:
+    peak, seconds = measure(workload)
+    if UPDATE:
+        baseline[name] = {"peak_bytes": peak, "relative_seconds": round(seconds, 3)}
+        return
+    if name not in baseline:
+        pytest.skip(f"No baseline for {name}, run with PERF_UPDATE_BASELINE=1")
+    expected: dict[str, float] = baseline[name]
+    assert peak <= expected["peak_bytes"] * MEMORY_TOLERANCE, (
+        f"{name} peak memory {peak:,} bytes, baseline {expected['peak_bytes']:,}"
+    )
+    assert seconds <= expected["relative_seconds"] * TIME_TOLERANCE, (
+        f"{name} took {seconds:.2f}x calibration, "
+        f"baseline {expected['relative_seconds']:.2f}x"
+    )
+
+
+@pytest.fixture(scope="module")
+def data(tmp_path_factory) -> dict[str, Path]:
+    directory: Path = tmp_path_factory.mktemp("perf")
+    prox = directory / "prox.csv"
+    lines: list[str] = [
+        "Active Accounts with Prox IDs",
+        "List of Active Accounts",
+        '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"',
+    ]
+    for i in range(PROX_ROWS):
+        universal_id: int = (3000000 if i % 2 else 4000000) + i // 2
+        lines.append(
+            f'"00{universal_id}","","0000{10000 + i}       ","Last{i}","First{i}","12/12/2050","False"'
+        )
+    prox.write_text("\n".join(lines) + "\n")
+    student_file = directory / "student_data.json"
+    student_file.write_text(json.dumps({"Report_Entry": students(PEOPLE)}))
+    employee_file = directory / "employee_data.json"
+    employee_file.write_text(json.dumps({"Report_Entry": employees(PEOPLE)}))
+    return {"prox": prox, "students": student_file, "employees": employee_file}
+
+
+@pytest.fixture(autouse=True)
+def fresh_report(monkeypatch):
+    # warnings would otherwise pile up across repeated runs
+    monkeypatch.setattr(create_koha_csv, "report", WarningReport())
+
+
+def test_create_prox_map(baseline, data):
+    assert len(create_prox_map(data["prox"])) == PROX_ROWS
+    check(baseline, "create_prox_map", lambda: create_prox_map(data["prox"]))
+
+
+def test_get_entries(baseline, data):
+    def workload() -> list[dict]:
+        with open(data["employees"]) as file:
+            return get_entries(json.load(file))
+
+    check(baseline, "get_entries", workload)
+
+
+@pytest.mark.parametrize("population", ["students", "employees"])
+def test_load_data(baseline, data, population):
+    check(
+        baseline,
+        f"load_data {population}",
+        lambda: cache.load_people(data[population], use_cache=False),
+    )
+
+
+def test_load_data_cached(baseline, data, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    cache.load_people(data["employees"])
+    check(baseline, "load_data cached", lambda: cache.load_people(data["employees"]))
+
+
+def test_make_rows(baseline, data):
+    prox_map: dict[str, str] = create_prox_map(data["prox"])
+    people = cache.load_people(data["students"], use_cache=False)
+    people += cache.load_people(data["employees"], use_cache=False)
+
+    def workload() -> list[dict | None]:
+        return [
+            make_student_row(person, prox_map, END_DATE)
+            if isinstance(person, Student)
+            else make_employee_row(person, prox_map, END_DATE)  # type: ignore
+            for person in people
+        ]
+
+    check(baseline, "make_student_row & make_employee_row", workload)
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_create_koha_csv(baseline, data, tmp_path, batch):
+    args: list[str] = [
+        str(data["prox"]),
+        "--end",
+        END_DATE,
+        "--student-data",
+        str(data["students"]),
+        "--employee-data",
+        str(data["employees"]),
+        "--output",
+        str(tmp_path / "patron_bulk_import.csv"),
+        "--manifest",
+        str(tmp_path / "manifest.json"),
+        "--warnings-file",
+        str(tmp_path / "warnings.txt"),
+        "--full",
+        "--no-cache",
+        *(["--batch"] if batch else []),
+    ]
+
+    def workload() -> None:
+        create_koha_csv.report = WarningReport()
+        result = CliRunner().invoke(create_koha_csv.main, args)
+        assert result.exit_code == 0, result.output
+
+    check(baseline, f"create_koha_csv{' --batch' if batch else ''}", workload)
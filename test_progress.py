@@ -0,0 +1,35 @@
+import io
+import time
+
+from progress import Progress
+
+
+def test_stalled_run_keeps_redrawing():
+    stream = io.StringIO()
+    progress = Progress(10, stream=stream, live=False, interval=0.05)
+    # nothing finishes, but elapsed time should still be reported
+    time.sleep(0.3)
+    progress.finish()
+    lines: list[str] = stream.getvalue().splitlines()
+    assert len(lines) >= 3
+    assert all(line.startswith("0/10 (0%)") for line in lines)
+
+
+def test_finish_stops_redrawing():
+    stream = io.StringIO()
+    progress = Progress(1, stream=stream, live=False, interval=0.05)
+    progress.advance()
+    progress.finish()
+    output: str = stream.getvalue()
+    time.sleep(0.15)
+    assert stream.getvalue() == output
+    assert output.splitlines()[-1].startswith("1/1 (100%)")
+
+
+def test_default_stream_is_current_stdout(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr("sys.stdout", stream)
+    progress = Progress(1, live=False)
+    progress.advance()
+    progress.finish()
+    assert stream.getvalue().startswith("1/1 (100%)")
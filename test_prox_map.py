@@ -1,6 +1,8 @@
+import gzip
+
 import pytest
 
-from patron_update import create_prox_map
+from prox import create_prox_map
 
 
 def test_create_prox_map_valid_format(tmp_path):
@@ -70,3 +72,15 @@ def test_create_prox_map_header_only(tmp_path):
         "1000002": "57427",
     }
     assert result == expected
+
+
+def test_create_prox_map_gzip(tmp_path):
+    # compressed reports are detected by magic bytes, not file extension
+    csv_content: str = """"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"
+"001000001","","000057426       ","Doe","John","12/12/2050","False"
+"""
+    csv_file = tmp_path / "prox.csv"
+    csv_file.write_bytes(gzip.compress(csv_content.encode()))
+
+    result: dict[str, str] = create_prox_map(csv_file)
+    assert result == {"1000001": "57426"}
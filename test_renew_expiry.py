@@ -0,0 +1,47 @@
+from collections.abc import Callable
+
+import pytest
+
+from renew_expiry import is_active
+from test_create_koha_csv import students
+from workday.models import Employee, Student
+
+
+@pytest.fixture
+def staff(employee) -> Callable[..., Employee]:
+    def make(**fields) -> Employee:
+        return Employee(**employee(0, **fields))
+
+    return make
+
+
+def student(**fields) -> Student:
+    return Student(
+        **{**students(1)[0], "inst_email": "s0@cca.edu", "username": "s0", **fields}
+    )
+
+
+def test_active_people(staff):
+    assert is_active(staff())
+    assert is_active(student())
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"username": "sraffeld"},
+        {"active_status": False},
+        {"work_email": None},
+        {"etype": "Contingent Employees/Contractors"},
+        {"job_profile": "Special Programs Instructor (inactive)"},
+        {"job_profile": "Temporary: Hourly"},
+        {"is_contingent": True},
+    ],
+)
+def test_inactive_employees(staff, fields):
+    assert not is_active(staff(**fields))
+
+
+@pytest.mark.parametrize("fields", [{"username": "sraffeld"}, {"inst_email": None}])
+def test_inactive_students(fields):
+    assert not is_active(student(**fields))
@@ -0,0 +1,82 @@
+import json
+
+import patron_update
+import scheduler
+
+
+def test_only_changed_people_are_synced(tmp_path, monkeypatch, employee):
+    monkeypatch.chdir(tmp_path)
+    synced: list[list[str]] = []
+
+    def fake_sync(populations, prox_map, dry_run, concurrency) -> dict[str, int]:
+        synced.append([p.username for ps in populations.values() for p in ps])
+        return patron_update.new_results()["totals"]
+
+    monkeypatch.setattr(patron_update, "sync", fake_sync)
+    data = tmp_path / "employee_data.json"
+    prox = tmp_path / "prox.csv"
+
+    def cycle(cleanup: bool = True) -> None:
+        scheduler.run_once(tmp_path, prox, None, False, False, cleanup, 4)
+
+    data.write_text(json.dumps([employee(i) for i in range(3)]))
+    cycle()
+    assert synced == [["staff0", "staff1", "staff2"]]
+    # sensitive files are deleted after a sync
+    assert not data.exists()
+
+    # the same export again is skipped
+    data.write_text(json.dumps([employee(i) for i in range(3)]))
+    cycle()
+    assert len(synced) == 1
+
+    # one name change syncs one person
+    data.write_text(
+        json.dumps([employee(0), employee(1, last_name="Renamed 1"), employee(2)])
+    )
+    cycle(cleanup=False)
+    assert synced[-1] == ["staff1"]
+    assert data.exists()
+
+
+def test_lock_is_exclusive(tmp_path):
+    with scheduler.lock(tmp_path / "lock") as first:
+        with scheduler.lock(tmp_path / "lock") as second:
+            assert first and not second
+    with scheduler.lock(tmp_path / "lock") as again:
+        assert again
+
+
+def test_exported_patrons_are_retried(tmp_path, monkeypatch, employee):
+    monkeypatch.chdir(tmp_path)
+    synced: list[list[str]] = []
+
+    def fake_sync(populations, prox_map, dry_run, concurrency) -> dict[str, int]:
+        people = [p for ps in populations.values() for p in ps]
+        synced.append([p.username for p in people])
+        # staff0's update went to the bulk update CSV, which writes patron data
+        result = patron_update.results.setdefault(
+            "Employee", patron_update.new_results()
+        )
+        result["pending"].append(({}, people[0], None))
+        (tmp_path / "2024-01-01-patron-bulk-update.csv").write_text("staff0\n")
+        return result["totals"]
+
+    monkeypatch.setattr(patron_update, "sync", fake_sync)
+    data = tmp_path / "employee_data.json"
+    for _ in range(2):
+        data.write_text(json.dumps([employee(i) for i in range(3)]))
+        scheduler.run_once(tmp_path, tmp_path / "prox.csv", None, False, False, True, 4)
+        assert not (tmp_path / "2024-01-01-patron-bulk-update.csv").exists()
+    # the same files again, only the exported patron is synced
+    assert synced == [["staff0", "staff1", "staff2"], ["staff0"]]
+
+
+def test_new_prox_file_waits_for_workday_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    prox = tmp_path / "prox.csv"
+    prox.write_text(
+        '"Universal ID","Student ID","Prox ID","Last Name","First Name","End Date","IsInactive"\n'
+    )
+    assert scheduler.run_once(tmp_path, prox, None, False, False, True, 4) is None
+    assert prox.exists()
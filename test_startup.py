@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
+# libraries that should only load when a code path actually needs them
+HEAVY_MODULES: tuple[str, ...] = (
+    "email_validator",
+    "koha_patron.config",
+    "pydantic",
+    "requests",
+    "termcolor",
+    "urllib3",
+)
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["create_koha_csv", "lookup", "patron_update", "renew_expiry", "scheduler"],
+)
+def test_cli_import_is_lightweight(module):
+    code: str = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+@pytest.mark.parametrize(
+    "script", ["create_koha_csv.py", "patron_update.py", "renew_expiry.py"]
+)
+def test_cli_help_is_lightweight(script):
+    # -X importtime lists every module imported, one per stderr line:
+    # "import time:  self [us] | cumulative | module"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script, "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported: set[str] = {
+        line.rsplit("|", 1)[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    assert "click" in imported
+    heavy: list[str] = sorted(
+        m for m in imported for h in HEAVY_MODULES if m == h or m.startswith(h + ".")
+    )
+    assert heavy == []
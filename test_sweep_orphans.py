@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from sweep_orphans import (
+    is_orphan,
+    koha_patrons,
+    needs_expiry,
+    universal_id,
+    update_orphan,
+    workday_ids,
+)
+
+
+def koha(userid: str, univid: str | None = None, category_id: str = "STAFF") -> dict:
+    attributes: list[dict] = [{"type": "UNIVID", "value": univid}] if univid else []
+    return {
+        "patron_id": 1,
+        "userid": userid,
+        "category_id": category_id,
+        "extended_attributes": attributes,
+    }
+
+
+def test_universal_id():
+    assert universal_id(koha("staff1", "2000001")) == "2000001"
+    assert universal_id(koha("staff1")) is None
+
+
+def test_is_orphan():
+    ids: set[str] = {"staff1", "2000002"}
+    assert not is_orphan(koha("staff1"), ids)
+    # usernames are compared case-insensitively
+    assert not is_orphan(koha("Staff1"), ids)
+    # username changed but universal ID still in Workday
+    assert not is_orphan(koha("renamed", "2000002"), ids)
+    assert is_orphan(koha("departed", "2000003"), ids)
+    # categories we don't load from Workday are never orphans
+    assert not is_orphan(koha("community", category_id="COMMUNITY"), ids)
+
+
+def test_needs_expiry():
+    assert needs_expiry("2030-01-01", "2024-06-01")
+    assert needs_expiry(None, "2024-06-01")
+    assert not needs_expiry("2020-01-01", "2024-06-01")
+
+
+class FakeResponse:
+    ok: bool = True
+
+    def __init__(self, body: list[dict] | dict):
+        self.body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> list[dict] | dict:
+        return self.body
+
+
+class FakeSession:
+    def __init__(self, patrons: list[dict]):
+        self.patrons = patrons
+        self.pages: list[int] = []
+        self.puts: list[dict] = []
+
+    def get(self, url: str, params: dict, headers: dict) -> FakeResponse:
+        page, per_page = params["_page"], params["_per_page"]
+        assert params["_order_by"] == "patron_id"
+        self.pages.append(page)
+        return FakeResponse(self.patrons[(page - 1) * per_page : page * per_page])
+
+    def put(self, url: str, json: dict) -> FakeResponse:
+        self.puts.append(json)
+        return FakeResponse(json)
+
+
+def test_koha_patrons_pages():
+    pytest.importorskip("koha_patron.config")
+    patrons: list[dict] = [koha(f"staff{i}") for i in range(25)]
+    http = FakeSession(patrons)
+    assert list(koha_patrons(http, per_page=10)) == patrons  # type: ignore
+    assert http.pages == [1, 2, 3]
+
+
+def test_update_orphan_appends_to_staff_notes():
+    pytest.importorskip("koha_patron.config")
+    record: dict = koha("departed", "2000003") | {
+        "expiry_date": "2030-01-01",
+        "staff_notes": "Lost card 2023",
+        "expired": False,
+    }
+    http = FakeSession([])
+    update_orphan(http, record, "2024-06-01", "Not in Workday 2024-06")  # type: ignore
+    (body,) = http.puts
+    assert body["staff_notes"] == "Lost card 2023\nNot in Workday 2024-06"
+    assert body["expiry_date"] == "2024-06-01"
+    assert "staff_note" not in body
+    assert "expired" not in body and "extended_attributes" not in body
+
+
+def test_workday_ids_skip_people_who_left(tmp_path, employee):
+    current: dict = employee(1, username="alee")
+    departed: dict = employee(2, active_status=False)
+    temp: dict = employee(3, etype="Contingent Employees/Contractors")
+    hourly: dict = employee(4, job_profile="Temporary: Hourly", username="dhourly")
+    file = tmp_path / "employee_data.json"
+    file.write_text(json.dumps([current, departed, temp, hourly]))
+    # temporary hourly staff get accounts from create_koha_csv.py, so they're
+    # current even though patron_update.py doesn't sync them
+    assert workday_ids((file,), use_cache=False) == {
+        "alee",
+        "2000001",
+        "dhourly",
+        "2000004",
+    }
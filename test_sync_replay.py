@@ -0,0 +1,200 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from click.testing import CliRunner
+
+import patron_update
+from koha_patron import cassette
+
+config = pytest.importorskip("koha_patron.config").config
+
+PATRONS: int = 200
+LATENCY: float = 0.01
+# serially the workload takes PATRONS * 2 requests * LATENCY = 4s
+MAX_SECONDS: float = 2.0
+
+
+def interaction(method: str, path: str, body, api_root: str | None = None) -> dict:
+    return {
+        "method": method,
+        "url": (api_root or config["api_root"]) + path,
+        "status": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(body),
+    }
+
+
+def write_cassette(path, api_roots: tuple[str, ...] = ()) -> None:
+    interactions: list[dict] = []
+    for api_root in api_roots or (config["api_root"],):
+        interactions.extend(koha_interactions(api_root))
+    path.write_text(json.dumps(interactions))
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch, employee):
+    """Replay Koha responses for PATRONS staff members from a cassette, in
+    tmp_path as the working directory. Yields (tmp_path, Workday JSON file)"""
+    write_cassette(tmp_path / "cassette.json")
+    workday_file = tmp_path / "employee_data.json"
+    workday_file.write_text(json.dumps([employee(i) for i in range(PATRONS)]))
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("KOHA_CASSETTE", str(tmp_path / "cassette.json"))
+    monkeypatch.setattr(cassette, "_from_env", None)
+    monkeypatch.setattr(patron_update, "check_cca_dns", lambda: True)
+    monkeypatch.setattr(patron_update, "results", {})
+    yield tmp_path, workday_file
+
+
+def koha_interactions(api_root: str) -> list[dict]:
+    interactions: list[dict] = [
+        interaction("POST", "/oauth/token", {"access_token": "replayed"}, api_root)
+    ]
+    for i in range(PATRONS):
+        # half the patrons have changed names so they are also PUT
+        koha: dict = {
+            "patron_id": i,
+            "userid": f"staff{i}",
+            "cardnumber": str(2000000 + i),
+            "firstname": "Staff",
+            "surname": f"Member {i}" if i % 2 else "Old Name",
+            "anonymized": False,
+            "expired": False,
+            "restricted": False,
+            "updated_on": "2024-01-01T00:00:00",
+        }
+        interactions.append(
+            interaction(
+                "GET", f"/patrons?userid=staff{i}&_match=exact", [koha], api_root
+            )
+        )
+        interactions.append(interaction("PUT", f"/patrons/{i}", koha, api_root))
+    return interactions
+
+
+@pytest.mark.perf
+def test_replayed_sync_throughput(replay, monkeypatch):
+    _, workday_file = replay
+    monkeypatch.setenv("KOHA_REPLAY_LATENCY", str(LATENCY))
+
+    start: float = time.perf_counter()
+    result = CliRunner().invoke(patron_update.main, ["-w", str(workday_file)])
+    elapsed: float = time.perf_counter() - start
+
+    assert result.exit_code == 0, result.output
+    assert "- Updated: 100" in result.output
+    assert "- Errors: 0" in result.output
+    assert elapsed < MAX_SECONDS
+
+
+def test_shards_share_a_worker_process(replay, monkeypatch):
+    _, workday_file = replay
+    # one process runs all 4 shards, each must report only its own patrons
+    monkeypatch.setattr(
+        patron_update,
+        "ProcessPoolExecutor",
+        lambda max_workers: ProcessPoolExecutor(max_workers=1),
+    )
+
+    result = CliRunner().invoke(
+        patron_update.main, ["-w", str(workday_file), "--workers", "4"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert f"- Total patrons: {PATRONS}" in result.output
+    assert "- Updated: 100" in result.output
+
+
+def test_large_change_set_is_exported(replay):
+    tmp_path, workday_file = replay
+
+    result = CliRunner().invoke(
+        patron_update.main, ["-w", str(workday_file), "--bulk-threshold", "50"]
+    )
+
+    # the first 50 changes found are PUT, the rest exported
+    assert result.exit_code == 0, result.output
+    assert "- Updated: 50" in result.output
+    assert "- Exported for bulk update: 50" in result.output
+    (export,) = tmp_path.glob("*-patron-bulk-update.csv")
+    assert len(export.read_text().splitlines()) == 51
+
+
+def test_dry_run_writes_no_export(replay):
+    tmp_path, workday_file = replay
+
+    result = CliRunner().invoke(
+        patron_update.main,
+        ["-w", str(workday_file), "--bulk-threshold", "50", "--dry-run"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "- Exported for bulk update: 50" in result.output
+    assert not list(tmp_path.glob("*-patron-bulk-update.csv"))
+
+
+def test_sync_remembers_koha_state(replay):
+    tmp_path, workday_file = replay
+
+    result = CliRunner().invoke(patron_update.main, ["-w", str(workday_file)])
+
+    assert result.exit_code == 0, result.output
+    known: dict = json.loads((tmp_path / patron_update.KOHA_STATE_FILE).read_text())
+    assert len(known) == PATRONS
+    people = patron_update.load_data(workday_file)
+    assert {patron_update.priority(p, None, known) for p in people} == {
+        patron_update.VERIFY
+    }
+
+
+def test_budget_skips_remaining_checks(replay):
+    _, workday_file = replay
+
+    result = CliRunner().invoke(
+        patron_update.main, ["-w", str(workday_file), "--budget", "0"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert f"- Not checked before --budget ran out: {PATRONS}" in result.output
+    assert "- Updated: 0" in result.output
+
+
+def test_targets_sync_concurrently(replay, monkeypatch):
+    targets: dict[str, dict[str, str]] = {
+        "production": {},
+        "staging": {"api_root": "https://staging.example.edu/api/v1"},
+    }
+    tmp_path, workday_file = replay
+    write_cassette(
+        tmp_path / "cassette.json", (config["api_root"], targets["staging"]["api_root"])
+    )
+    monkeypatch.setattr(
+        pytest.importorskip("koha_patron.config"), "targets", targets, raising=False
+    )
+
+    result = CliRunner().invoke(
+        patron_update.main,
+        ["-w", str(workday_file), "-t", "production", "-t", "staging"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "- production: 100 updated, 0 exported, 0 missing, 0 errors" in result.output
+    assert "- staging: 100 updated, 0 exported, 0 missing, 0 errors" in result.output
+
+
+def test_unknown_target(tmp_path, monkeypatch, employee):
+    workday_file = tmp_path / "employee_data.json"
+    workday_file.write_text(json.dumps([employee(0)]))
+    monkeypatch.setattr(
+        pytest.importorskip("koha_patron.config"), "targets", {}, raising=False
+    )
+
+    result = CliRunner().invoke(
+        patron_update.main, ["-w", str(workday_file), "-t", "nowhere"]
+    )
+
+    assert result.exit_code == 2
+    assert "No Koha target nowhere" in result.output
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from sync_service import Coalescer, parse_events
+
+
+def test_burst_of_events_makes_one_write():
+    applied: list[dict] = []
+    done = threading.Event()
+
+    def apply(event: dict) -> None:
+        applied.append(event)
+        done.set()
+
+    queue = Coalescer(apply, window=0.1)
+    worker = threading.Thread(target=queue.run)
+    worker.start()
+    start: float = time.monotonic()
+    queue.submit({"universal_id": "1", "prox": "11111"})
+    queue.submit({"universal_id": "1", "first_name": "Ann"})
+    queue.submit({"universal_id": "1", "prox": "22222"})
+    assert done.wait(1)
+    assert time.monotonic() - start < 1
+    queue.stop()
+    worker.join()
+    assert applied == [{"universal_id": "1", "prox": "22222", "first_name": "Ann"}]
+
+
+def test_stop_applies_pending_events():
+    applied: list[dict] = []
+    queue = Coalescer(applied.append, window=60)
+    worker = threading.Thread(target=queue.run)
+    worker.start()
+    queue.submit({"universal_id": "1", "prox": "11111"})
+    queue.submit({"universal_id": "2", "prox": "22222"})
+    queue.stop()
+    worker.join(1)
+    assert not worker.is_alive()
+    assert sorted(e["universal_id"] for e in applied) == ["1", "2"]
+
+
+def test_parse_events():
+    people: dict = {"1": object()}
+    assert parse_events(b'{"universal_id": 1, "prox": "11111"}', people) == [
+        {"universal_id": "1", "prox": "11111"}
+    ]
+    assert (
+        len(parse_events(b'[{"universal_id": "1"}, {"universal_id": "1"}]', people))
+        == 2
+    )
+    with pytest.raises(ValueError):
+        parse_events(b'{"prox": "11111"}', people)
+    with pytest.raises(ValueError):
+        parse_events(b'{"universal_id": "1", "cardnumber": "11111"}', people)
+    with pytest.raises(LookupError):
+        parse_events(b'{"universal_id": "2"}', people)
@@ -0,0 +1,79 @@
+"""Cache of validated Workday records so repeat runs skip JSON decoding and
+pydantic validation. Entries are pickles keyed by the source file's hash and
+a hash of the models' JSON schema, so editing either one invalidates them."""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from functools import cache
+from pathlib import Path
+
+from compressed import open_text
+
+from .models import Employee, Person, Student
+from .utils import get_entries
+
+# clean.py deletes this directory, it holds personal information
+CACHE_DIR = Path(os.environ.get("WORKDAY_CACHE", ".workday_cache"))
+
+
+@cache
+def schema_version() -> str:
+    schemas: list[dict] = [Employee.model_json_schema(), Student.model_json_schema()]
+    return hashlib.sha256(json.dumps(schemas, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def file_hash(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def parse(path: str | Path) -> list[Person]:
+    """Read & validate a Workday JSON file, detecting the type of person from
+    its first entry."""
+    from pydantic import TypeAdapter
+
+    with open_text(path) as file:
+        people_dicts: list[dict] = get_entries(json.load(file))
+
+    if people_dicts[0].get("employee_id"):
+        return TypeAdapter(list[Employee]).validate_python(people_dicts)
+    elif people_dicts[0].get("student_id"):
+        return TypeAdapter(list[Student]).validate_python(people_dicts)
+    raise RuntimeError(
+        f"Could not determine the type of person from the first entry in the JSON file {path}."
+    )
+
+
+def load_people(path: str | Path, use_cache: bool = True) -> list[Person]:
+    """Validated people from a Workday JSON file, from the cache if possible"""
+    if not use_cache:
+        return parse(path)
+
+    stem: str = Path(path).name
+    entry: Path = CACHE_DIR / f"{stem}-{file_hash(path)}-{schema_version()}.pickle"
+    try:
+        with open(entry, "rb") as file:
+            return pickle.load(file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        # not cached yet, or truncated by an older run that crashed
+        pass
+
+    people: list[Person] = parse(path)
+    CACHE_DIR.mkdir(exist_ok=True)
+    # replace stale entries for the same file name
+    for stale in CACHE_DIR.glob(f"{stem}-*.pickle"):
+        stale.unlink(missing_ok=True)
+    # write under a temporary name so a crash or a concurrent run never leaves
+    # a partial entry under the final name
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=CACHE_DIR, suffix=".partial", delete=False
+    ) as file:
+        pickle.dump(people, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(file.name, entry)
+    return people
@@ -1,5 +1,9 @@
+import json
+
 import pytest
 
+from workday import cache
+from workday.models import Employee
 from workday.utils import get_entries
 
 
@@ -15,3 +19,56 @@ def test_get_entries(data, expected):
 def test_get_entries_raises_exception(data):
     with pytest.raises(Exception):  # type: ignore
         get_entries(data)
+
+
+def test_load_people_uses_cache(tmp_path, monkeypatch, employee):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    data_file = tmp_path / "employee_data.json"
+    record: dict = employee(1, username="alee")
+    data_file.write_text(json.dumps({"Report_Entry": [record]}))
+
+    people = cache.load_people(data_file)
+    assert people == [Employee(**record)]
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    # a cache hit never parses the file
+    monkeypatch.setattr(cache, "parse", lambda path: pytest.fail("cache miss"))
+    assert cache.load_people(data_file) == people
+
+
+def test_load_people_cache_invalidated_by_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    data_file = tmp_path / "student_data.json"
+    student: dict = {
+        "academic_level": "Graduate",
+        "first_name": "Cy",
+        "last_name": "Park",
+        "primary_program": "Design",
+        "programs": [],
+        "student_id": "s1",
+        "universal_id": "1000003",
+        "username": "cpark",
+    }
+    data_file.write_text(json.dumps([student]))
+    cache.load_people(data_file)
+    data_file.write_text(json.dumps([student | {"first_name": "Cyrus"}]))
+
+    assert cache.load_people(data_file)[0].first_name == "Cyrus"
+    # the stale entry was replaced
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_load_people_reparses_truncated_entry(tmp_path, monkeypatch, employee):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    data_file = tmp_path / "employee_data.json"
+    record: dict = employee(1, username="alee")
+    data_file.write_text(json.dumps([record]))
+    people = cache.load_people(data_file)
+    (entry,) = (tmp_path / "cache").iterdir()
+
+    # e.g. a run that crashed while writing it
+    entry.write_bytes(entry.read_bytes()[:10])
+    assert cache.load_people(data_file) == people
+    entry.write_bytes(b"")
+    assert cache.load_people(data_file) == people
+    assert list((tmp_path / "cache").iterdir()) == [entry]